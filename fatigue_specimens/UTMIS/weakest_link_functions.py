@@ -77,12 +77,7 @@ def _get_geometry_data():
     return data
 
 
-def calc_pf_for_simulation(simulation, parameters):
-    a800 = parameters[0]
-    a1 = parameters[1]
-    a2 = 0
-    b = parameters[2]
-
+def _fem_data_for_simulation(simulation, a800):
     idx = np.argsort(np.abs(evaluated_findley_parameters - a800))[:2]
     a800_levels = evaluated_findley_parameters[idx]
 
@@ -117,15 +112,36 @@ def calc_pf_for_simulation(simulation, parameters):
     fem_data = FEM_data(stress=findley_stress.reshape(n/8, 8),
                         steel_data=steel_data,
                         nodal_positions=nodal_positions.reshape(n/8, 8, 3))
+    return fem_data
 
-    fit_material = SS2506MaterialTemplate(a1, a2, b)
+
+def _size_factor(simulation):
     size_factor = 4
     if simulation.R < 0:
         size_factor = 8
-    wl_evaluator = WeakestLinkEvaluator(data_volume=fem_data, data_area=None, size_factor=size_factor)
+    return size_factor
+
+
+def calc_pf_for_simulation(simulation, parameters):
+    a800 = parameters[0]
+    a1 = parameters[1]
+    a2 = 0
+    b = parameters[2]
+
+    fem_data = _fem_data_for_simulation(simulation, a800)
+    fit_material = SS2506MaterialTemplate(a1, a2, b)
+    wl_evaluator = WeakestLinkEvaluator(data_volume=fem_data, data_area=None, size_factor=_size_factor(simulation))
     return wl_evaluator.calculate_pf(material=fit_material)
 
 
+def calc_pf_for_parameter_sets(simulation, a800, material_parameters):
+    # pf of the simulation for each row (swa, swb, mb) of material_parameters, for parameter grids and population
+    # based optimisers. The Findley stress for a800 and the evaluator are created once for all the sets
+    fem_data = _fem_data_for_simulation(simulation, a800)
+    wl_evaluator = WeakestLinkEvaluator(data_volume=fem_data, data_area=None, size_factor=_size_factor(simulation))
+    return wl_evaluator.calculate_pf_batch(material_parameters)
+
+
 def residual_fit(parameters, *data):
     simulation_list, lower_bound, upper_bound = data
     parameters = _check_parameter_bounds(parameters, lower_bound, upper_bound)
@@ -3,7 +3,7 @@ from __future__ import print_function
 from collections import namedtuple
 import numpy as np
 
-SteelData = namedtuple('Steel_data', ['HV'])
+SteelData = namedtuple('SteelData', ['HV'])
 PhaseData = namedtuple('PhaseData', ['Martensite', 'Austenite', 'Bainite', 'Pearlite', 'Ferrite'])
 
 
@@ -113,6 +113,19 @@ class SS2506MaterialTemplate:
         return np.squeeze(f * austenite_fraction)
 
 
+class FindleyParameterA800:
+    # Findley parameter varying linearly with the hardness from a450 at 450 HV to a800 at 800 HV. a800 can be an array
+    # of values, findley_k then returns one parameter field for each of them, shape (len(a800), nodes)
+    def __init__(self, a800, a450=0.3):
+        self.a800 = np.asarray(a800, dtype=float)
+        self.b = (self.a800 - a450)/(800 - 450)
+        self.a = self.a800 - self.b*800
+
+    def findley_k(self, steel_properties):
+        hv = np.asarray(steel_properties.HV, dtype=float)
+        return np.multiply.outer(self.a, np.ones(hv.shape)) + np.multiply.outer(self.b, hv)
+
+
 # SS2506 = SS2506MaterialTemplate(swa=138, swb=0.71, mb=11.06e6)
 # SS2506 = SS2506MaterialTemplate(swa=378, swb=0.175, mb=6.15e6)
 SS2506 = SS2506MaterialTemplate(swa=900, swb=0, mb=15.)
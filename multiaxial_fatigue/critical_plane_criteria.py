@@ -0,0 +1,73 @@
+import numpy as np
+
+
+class CriticalPlaneCriterion(object):
+    # Base class for the criteria evaluated by eval_critical_plane_criteria. The critical plane is the plane maximizing
+    # selection and the results for a node are [phi, theta, normal_stress, tau_amplitude, value] on that plane.
+    # The parameter of the criterion is given per node and has the shape (nodes,). plane_data is a PlaneData from
+    # findley_evaluation_functions
+    name = None
+
+    def value(self, plane_data, parameter):
+        raise NotImplementedError
+
+    def selection(self, plane_data, parameter):
+        return self.value(plane_data, parameter)
+
+    @staticmethod
+    def normal_stress(plane_data):
+        return np.max(plane_data.sigma_n, axis=-1)
+
+
+class Findley(CriticalPlaneCriterion):
+    # tau_a + k*sigma_n_max maximized over the planes, parameter k
+    name = 'Findley'
+
+    def value(self, plane_data, parameter):
+        return plane_data.tau_amplitude + parameter*np.max(plane_data.sigma_n, axis=-1)
+
+
+class Matake(CriticalPlaneCriterion):
+    # tau_a + mu*sigma_n_max on the plane with the largest shear stress amplitude, parameter mu
+    name = 'Matake'
+
+    def value(self, plane_data, parameter):
+        return plane_data.tau_amplitude + parameter*np.max(plane_data.sigma_n, axis=-1)
+
+    def selection(self, plane_data, parameter):
+        return plane_data.tau_amplitude
+
+
+class McDiarmid(Matake):
+    # tau_a + t_AB/(2*sigma_uts)*sigma_n_max on the plane with the largest shear stress amplitude, the parameter is
+    # t_AB/(2*sigma_uts). Case A or case B cracking is chosen through t_AB, the shear fatigue strength of that case
+    name = 'McDiarmid'
+
+
+class DangVan(CriticalPlaneCriterion):
+    # max_t |tau(t) - tau_m| + a*p(t) maximized over the planes where tau_m is the center of the smallest enclosing
+    # circle of the shear stresses and p the hydrostatic stress, parameter a. The normal stress column holds the largest
+    # hydrostatic stress
+    name = 'Dang Van'
+
+    def value(self, plane_data, parameter):
+        tau = np.sqrt((plane_data.tau_1 - plane_data.tau_center_1[:, :, None])**2 +
+                      (plane_data.tau_2 - plane_data.tau_center_2[:, :, None])**2)
+        return np.max(tau + parameter[:, None]*plane_data.hydrostatic_stress[None, :, :], axis=-1)
+
+    @staticmethod
+    def normal_stress(plane_data):
+        return np.max(plane_data.hydrostatic_stress, axis=-1)[None, :] + 0*plane_data.tau_amplitude
+
+
+class BrownMiller(CriticalPlaneCriterion):
+    # Stress based Brown-Miller type criterion, tau_a + k*sigma_n_a maximized over the planes where sigma_n_a is the
+    # normal stress amplitude, parameter k
+    name = 'Brown-Miller'
+
+    def value(self, plane_data, parameter):
+        return plane_data.tau_amplitude + parameter*self.normal_stress(plane_data)
+
+    @staticmethod
+    def normal_stress(plane_data):
+        return (np.max(plane_data.sigma_n, axis=-1) - np.min(plane_data.sigma_n, axis=-1))/2
@@ -0,0 +1,93 @@
+import os
+
+import numpy as np
+
+from multiaxial_fatigue.findley_evaluation_functions import evaluate_findley
+from multiaxial_fatigue.findley_evaluation_functions import findley_fingerprint
+
+
+class FindleyCache:
+    # On disk cache in front of evaluate_findley. The results are stored in directory in files named by a hash of the
+    # stress history, a_cp, the search grid, the engine and its options, the other arguments changing the results and
+    # findley_engine_version. A repeated evaluation, for instance when a sweep is re-run after adding one a800 value,
+    # reads the results from file instead of evaluating them again.
+    #
+    # When the files in directory use more than max_size bytes the least recently used files are removed.
+    # hits and misses count the evaluations read from the cache and the evaluations made
+    def __init__(self, directory, max_size=10*1024**3):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def evaluate_findley(self, combined_stress, a_cp, worker_run_out_time, chunk_size, **kwargs):
+        # Same arguments and results as evaluate_findley. Evaluations writing to an output file are not cached
+        if kwargs.get('output_file', None):
+            return evaluate_findley(combined_stress, a_cp, worker_run_out_time, chunk_size, **kwargs)
+        if isinstance(combined_stress, str):
+            combined_stress = np.load(combined_stress, mmap_mode='r')
+
+        filename = os.path.join(self.directory, self.key(combined_stress, a_cp, **kwargs) + '.npz')
+        if os.path.isfile(filename):
+            with np.load(filename) as data:
+                results = data['results']
+                statistics = data['statistics'] if 'statistics' in data.files else None
+            os.utime(filename, None)
+            self.hits += 1
+            print(" Findley results read from cache " + filename)
+            if statistics is not None:
+                return results, statistics
+            return results
+
+        self.misses += 1
+        results = evaluate_findley(combined_stress, a_cp, worker_run_out_time, chunk_size, **kwargs)
+        # The file is written under a temporary name and renamed to never leave a partly written file in the cache
+        temporary_filename = filename[:-4] + '_' + str(os.getpid()) + '.tmp.npz'
+        if kwargs.get('statistics', False):
+            np.savez(temporary_filename, results=results[0], statistics=results[1])
+        else:
+            np.savez(temporary_filename, results=results)
+        os.rename(temporary_filename, filename)
+        self.evict()
+        return results
+
+    @staticmethod
+    def key(combined_stress, a_cp, search_grid=5, engine='loop', engine_options=None, statistics=False,
+            screen_threshold=None, screen_fraction=None, single_precision=False, **kwargs):
+        # Hash of everything determining the results. The remaining keyword arguments of evaluate_findley, as the
+        # number of workers or the chunk size, only change how the results are computed. single_precision is part of
+        # the key since the single precision results differ slightly from the double precision ones
+        return findley_fingerprint(combined_stress, a_cp, search_grid, engine, engine_options, statistics,
+                                   screen_threshold, screen_fraction, single_precision)
+
+    def size(self):
+        return sum(os.path.getsize(os.path.join(self.directory, filename)) for filename in self._cache_files())
+
+    def evict(self):
+        # Removes the least recently used files until the cache is not larger than max_size
+        cache_files = [os.path.join(self.directory, filename) for filename in self._cache_files()]
+        cache_files.sort(key=os.path.getmtime)
+        size = sum(os.path.getsize(filename) for filename in cache_files)
+        while cache_files and size > self.max_size:
+            filename = cache_files.pop(0)
+            size -= os.path.getsize(filename)
+            os.remove(filename)
+
+    def clear(self):
+        for filename in self._cache_files():
+            os.remove(os.path.join(self.directory, filename))
+
+    def hit_rate(self):
+        if self.hits + self.misses == 0:
+            return 0.
+        return float(self.hits)/(self.hits + self.misses)
+
+    def print_statistics(self):
+        print(" Findley cache: %i hits, %i misses, hit rate %1.1f %%, %1.1f MB in %s" % (
+            self.hits, self.misses, 100*self.hit_rate(), self.size()/1024.**2, self.directory))
+
+    def _cache_files(self):
+        return [filename for filename in os.listdir(self.directory)
+                if filename.endswith('.npz') and not filename.endswith('.tmp.npz')]
@@ -1,12 +1,189 @@
 # Import standard python modules
 import numpy as np
+import hashlib
 import time, sys, pickle, multiprocessing
+import mmap, os, shutil, tempfile
+from collections import namedtuple
 from math import sin, cos, pi, sqrt
+from scipy.spatial import ConvexHull
+
+# Version of the Findley engines, increased when a change in an engine changes its results. Part of the key of the
+# cached results in findley_cache
+findley_engine_version = 3
+
+# Description of an array in a file which is memory mapped by the workers instead of being sent to them
+SharedArray = namedtuple('SharedArray', ['filename', 'dtype', 'shape', 'offset'])
+
+# Findley parameter computed by the workers from a material model as material.findley_k(steel_data), where the fields
+# of steel_data, for instance SteelData(HV=...), hold one value per row. findley_k can return several parameter fields,
+# shape (parameters, rows), which are evaluated in the same plane sweep. Can be given as a_cp to evaluate_findley
+FindleyParameterModel = namedtuple('FindleyParameterModel', ['material', 'steel_data'])
+
+# Planes searched for the critical plane with their normals and transformation matrices, see plane_bank
+PlaneBank = namedtuple('PlaneBank', ['theta', 'phi', 'normals', 'transform_matrices', 'transform_rows'])
+_plane_banks = {}
+_plane_neighbours_cache = {}
+
+# Stresses on a batch of planes for a chunk of nodes, used by the criteria in critical_plane_criteria
+#   sigma_n, tau_1, tau_2           Normal and shear stresses on the planes, shape (planes, nodes, load_steps)
+#   tau_amplitude                   Radius of the smallest enclosing circle of the shear stresses, shape (planes, nodes)
+#   tau_center_1, tau_center_2      Center of the smallest enclosing circle, shape (planes, nodes)
+#   hydrostatic_stress              Hydrostatic stress, shape (nodes, load_steps)
+PlaneData = namedtuple('PlaneData', ['sigma_n', 'tau_1', 'tau_2', 'tau_amplitude', 'tau_center_1', 'tau_center_2',
+                                     'hydrostatic_stress'])
 
 
 def evaluate_findley(combined_stress, a_cp, worker_run_out_time, chunk_size, num_workers=multiprocessing.cpu_count(),
-                     w_pool=None, search_grid=5):
+                     w_pool=None, search_grid=5, engine='loop', engine_options=None, statistics=False,
+                     shared_memory=False, output_file=None, screen_threshold=None, screen_fraction=None,
+                     reduce_history=False, adaptive_chunks=False, chunk_time=1.0, plane_parallel=None,
+                     single_precision=False, validation_rows=None):
+    # engine selects the function evaluating each chunk, see _findley_engines
+    #   'loop'          The original node by node and plane by plane evaluation, eval_findley
+    #   'vectorized'    All nodes on a batch of planes are transformed in one tensor contraction,
+    #                   eval_findley_vectorized. Gives the same results as 'loop'
+    #   'adaptive'      A coarse scan with search_grid followed by a local refinement around the best planes of each
+    #                   node, eval_findley_adaptive
+    #   'load_sweep'    Many load levels of a residual stress and unit load histories, eval_findley_load_sweep, used
+    #                   by evaluate_findley_load_sweep
+    #   'continuation'  The load levels of 'load_sweep' with the critical plane followed from level to level,
+    #                   eval_findley_continuation, used by evaluate_findley_load_sweep(..., continuation=True)
+    #   'criteria'      Several critical plane criteria from the same plane sweep, eval_critical_plane_criteria. The
+    #                   criteria are given as engine_options={'criteria': [...]}, see critical_plane_criteria, and
+    #                   a_cp has the shape (criteria, rows) with the parameter of each criterion
+    # engine_options is a dict with additional keyword arguments to the engine
+    # a_cp is an array with the Findley parameter of each row or a FindleyParameterModel, the parameters are then
+    # computed by the workers for their rows
+    # a_cp can have the shape (parameters, rows) for the 'vectorized', 'load_sweep' and 'criteria' engines, the results
+    # then have the shape (parameters, rows, 5) and each plane sweep is made once for all parameter fields
+    # If statistics is True the per node statistics of the engine are returned together with the results
+    # If shared_memory is True the stress history and a_cp are stored once in memory mapped files which the workers read
+    # their rows from, only the row ranges are sent to the workers. A combined_stress which already is a memory mapped
+    # array, for instance from np.load(..., mmap_mode='r'), is used directly. combined_stress can also be the name of a
+    # .npy file which is then memory mapped
+    # If output_file, a .npy file, is given the results are written to it as a memory mapped array which is returned.
+    # The completed rows are recorded in a checkpoint file next to it and a run which was stopped is resumed from the
+    # checkpoint, only the chunks not completed are evaluated. A checkpoint from other inputs, see findley_fingerprint,
+    # is not resumed. The stress history is read from file by the workers as with shared_memory
+    # If screen_threshold or screen_fraction is given an upper bound of the Findley stress, see findley_upper_bound, is
+    # computed first and the critical plane search is only made for the rows where the bound is at least
+    # screen_threshold and for the fraction screen_fraction of the rows with the highest Findley stresses. For the
+    # fraction, the rows with the highest bounds are evaluated first and then all rows with a bound above the lowest
+    # Findley stress found among them. The skipped rows get the bounds from findley_upper_bound with NaN as angles
+    # If reduce_history is True the load history of each row is replaced by the vertices of its convex hull, see
+    # reduce_load_history, before the evaluation. This does not change the results
+    # The chunks are submitted to the pool as workers become free, at most two per worker at the time, and the results
+    # are collected in the order they are completed. If adaptive_chunks is True chunk_size is only used for the first
+    # chunks, the following chunks are sized from the measured time per row to take about chunk_time seconds and are
+    # made smaller towards the end so that all workers finish at about the same time. The pool occupancy and the tail
+    # latency, the time from the last submitted chunk to the end of the run, are printed
+    # If plane_parallel is True the planes instead of the rows are split between the workers, see
+    # evaluate_findley_plane_parallel. With plane_parallel=None this is done automatically when there are fewer than
+    # _plane_parallel_factor rows per worker and the engine is 'vectorized' or 'loop' without engine options
+    # If single_precision is True the engines in _engines_with_single_precision compute in single precision, which
+    # halves the memory used for the stresses. The stress history is converted to float32 chunk by chunk, when the
+    # chunks are sent to the workers or written to the shared file, and a memory mapped stress history is converted by
+    # the workers for their rows, it is never copied as a whole. With validation_rows a random sample of that many rows
+    # is also evaluated in double precision and the largest deviations of the stresses are printed
+    if reduce_history:
+        if engine in ['load_sweep', 'continuation']:
+            raise ValueError("The load history can not be reduced for the " + engine + " engine")
+        if isinstance(combined_stress, str):
+            combined_stress = np.load(combined_stress, mmap_mode='r')
+        load_steps = combined_stress.shape[0]
+        combined_stress, kept_steps = reduce_load_history(combined_stress)
+        print(" Load history reduction: %i of %i load steps kept, %i load steps after padding, ratio %1.3f" % (
+            np.sum(kept_steps), load_steps*kept_steps.shape[0], combined_stress.shape[0],
+            float(combined_stress.shape[0])/load_steps))
+    if single_precision:
+        if engine not in _engines_with_single_precision:
+            raise ValueError("The Findley engine " + str(engine) + " has no single precision mode")
+        if isinstance(combined_stress, str):
+            combined_stress = np.load(combined_stress, mmap_mode='r')
+        # The dtype in the engine options is also the dtype the stress chunks are converted to
+        engine_options = dict(engine_options or {}, dtype=np.float32)
+        fatigue_results = evaluate_findley(combined_stress, a_cp, worker_run_out_time, chunk_size,
+                                           num_workers=num_workers, w_pool=w_pool, search_grid=search_grid,
+                                           engine=engine, engine_options=engine_options, statistics=statistics,
+                                           shared_memory=shared_memory, output_file=output_file,
+                                           screen_threshold=screen_threshold, screen_fraction=screen_fraction,
+                                           reduce_history=False, adaptive_chunks=adaptive_chunks,
+                                           chunk_time=chunk_time, plane_parallel=plane_parallel)
+        if validation_rows:
+            validate_precision(fatigue_results, combined_stress, a_cp, search_grid, engine, engine_options,
+                               validation_rows)
+        return fatigue_results
+    if screen_threshold is not None or screen_fraction is not None:
+        # The upper bound from findley_upper_bound is only a bound of the Findley stress, not of the other criteria
+        if output_file or engine in ['load_sweep', 'continuation', 'criteria']:
+            raise ValueError("Screening is not available with an output file or the " + str(engine) + " engine")
+        if isinstance(combined_stress, str):
+            combined_stress = np.load(combined_stress, mmap_mode='r')
+        fatigue_results = findley_upper_bound(combined_stress, findley_parameters(a_cp))
+        bound = np.copy(fatigue_results[..., 4])
+        evaluated_rows = screen_rows(bound, screen_threshold, screen_fraction)
+        remaining_rows = evaluated_rows
+        engine_statistics = None
+        while np.any(remaining_rows):
+            rows = np.nonzero(remaining_rows)[0]
+            print(" Screening: the critical plane search is made for %i of %i rows" % (rows.shape[0],
+                                                                                      bound.shape[-1]))
+            evaluated_results = evaluate_findley(combined_stress[:, rows, :], findley_parameter_rows(a_cp, rows),
+                                                 worker_run_out_time, chunk_size, num_workers=num_workers,
+                                                 w_pool=w_pool, search_grid=search_grid, engine=engine,
+                                                 engine_options=engine_options, statistics=statistics,
+                                                 shared_memory=shared_memory, adaptive_chunks=adaptive_chunks,
+                                                 chunk_time=chunk_time, plane_parallel=plane_parallel)
+            if statistics:
+                evaluated_results, evaluated_statistics = evaluated_results
+                if engine_statistics is None:
+                    engine_statistics = np.empty((bound.shape[-1], evaluated_statistics.shape[1]))
+                    engine_statistics[:] = np.nan
+                engine_statistics[rows] = evaluated_statistics
+            fatigue_results[..., rows, :] = evaluated_results
+
+            remaining_rows = np.zeros(bound.shape[-1], dtype=bool)
+            if screen_fraction is not None:
+                # Rows which can have a higher Findley stress than the lowest one among the highest evaluated rows
+                count = int(np.ceil(screen_fraction*bound.shape[-1]))
+                findley_stress = np.where(evaluated_rows, fatigue_results[..., 4], -np.inf)
+                lowest = np.sort(findley_stress, axis=-1)[..., -count]
+                remaining_rows = np.logical_and(np.any((bound >= lowest[..., None]).reshape(-1, bound.shape[-1]),
+                                                       axis=0), ~evaluated_rows)
+                evaluated_rows = np.logical_or(evaluated_rows, remaining_rows)
+        if statistics:
+            return fatigue_results, engine_statistics
+        return fatigue_results
+
+    if engine not in _findley_engines:
+        raise ValueError("Unknown Findley engine " + str(engine) + ", valid engines are " +
+                         ", ".join(sorted(_findley_engines.keys())))
+    engine_options = dict(engine_options or {})
+    # Precision of the engine, the stress chunks are converted to it before they are sent to the workers
+    stress_dtype = engine_options.get('dtype')
+    if len(_findley_parameter_shape(a_cp)) > 1 and engine not in _engines_with_parameter_fields:
+        raise ValueError("The Findley engine " + engine + " only handles one Findley parameter field")
+    if statistics:
+        if engine not in _engines_with_statistics:
+            raise ValueError("The Findley engine " + engine + " does not provide statistics")
+        engine_options['return_statistics'] = True
+    if output_file:
+        if statistics:
+            raise ValueError("Statistics are not available when the results are written to an output file")
+        shared_memory = True
+    if isinstance(combined_stress, str):
+        combined_stress = np.load(combined_stress, mmap_mode='r')
+    if plane_parallel is None:
+        plane_parallel = (not output_file and (engine == 'vectorized' or (engine == 'loop' and not engine_options))
+                          and np.shape(combined_stress)[1] < _plane_parallel_factor*num_workers)
+    if plane_parallel:
+        if output_file or engine not in ['vectorized', 'loop']:
+            raise ValueError("The planes can only be split between the workers for the 'vectorized' and 'loop' "
+                             "engines without an output file")
+        return evaluate_findley_plane_parallel(combined_stress, a_cp, worker_run_out_time, num_workers, w_pool,
+                                               search_grid, engine_options)
     s_time = time.time()
+    _engine_plane_bank(search_grid, engine, engine_options)
     if not w_pool:
         worker_pool = multiprocessing.Pool(processes=num_workers)
     else:
@@ -16,33 +193,77 @@ def evaluate_findley(combined_stress, a_cp, worker_run_out_time, chunk_size, num
     load_steps, rows, columns = combined_stress.shape
     print(" Read %2i load steps with %i stress tensors" % (load_steps, rows))
 
-    # Create workload vector
+    # Create workload vector, with adaptive_chunks only the first chunks have the size chunk_size
     work_loads = list(range(0, rows, chunk_size))
     if not work_loads[-1] == rows:
         work_loads.append(rows)
-    print(" Number or work pieces to process: ", len(work_loads))
+    if not adaptive_chunks:
+        print(" Number or work pieces to process: ", len(work_loads) - 1)
 
-    # Create storage point for Findley results
-    fatigue_results = np.empty([work_loads[-1], 5], dtype=float)  # f,sigma_n,tau_n,Nf50,Nf99
-    if True:
-        # Submit workloads for evaluation of Findley stress
+    shared_directory = None
+    if shared_memory:
+        shared_directory = tempfile.mkdtemp(prefix='findley_')
+        stress_source = share_array(combined_stress, os.path.join(shared_directory, 'stress.dat'), stress_dtype)
+        if isinstance(a_cp, FindleyParameterModel):
+            a_cp_source = a_cp._replace(steel_data=type(a_cp.steel_data)(*[
+                share_array(field, os.path.join(shared_directory, 'steel_data_' + str(i) + '.dat'))
+                for i, field in enumerate(a_cp.steel_data)]))
+        else:
+            a_cp_source = share_array(a_cp, os.path.join(shared_directory, 'a_cp.dat'))
+
+    # Create storage point for Findley results, one result array for each parameter field if a_cp has the shape
+    # (parameters, rows)
+    result_shape = _result_shape(a_cp, engine, engine_options) + (rows, 5)
+    if output_file:
+        fingerprint = findley_fingerprint(combined_stress, a_cp, search_grid, engine, engine_options)
+        fatigue_results, completed_rows = open_findley_output(output_file, result_shape, fingerprint)
+    else:
+        fatigue_results = np.empty(result_shape, dtype=float)  # f,sigma_n,tau_n,Nf50,Nf99
+        completed_rows = None
+    try:
         print(" Computing critical plane stress:")
+        scheduler = ChunkScheduler(rows, chunk_size, num_workers, adaptive_chunks, chunk_time, completed_rows)
         findley_load_step_jobs = []
-        for work_load in range(0, len(work_loads) - 1):
-            findley_load_step_jobs.append(worker_pool.apply_async(findley_worker,
-                                                                  [[a_cp[work_loads[work_load]:work_loads[work_load + 1]],
-                                                                    combined_stress[:, work_loads[work_load]:
-                                                                                    work_loads[work_load + 1], :],
-                                                                    search_grid]]))
-        # Retrieve results for workloads
-        for work_load, findley_load_step_job in enumerate(findley_load_step_jobs):
-            # print "Working with workload " + str(work_load)
-            fatigue_results[work_loads[work_load]:work_loads[work_load + 1], 0:5] = findley_load_step_job.get(
-                worker_run_out_time)
-            print(".",)
-            # print "Done with workload " + str(work_load)
-            sys.stdout.flush()  # Force output of buffered content
+        engine_statistics = []
+        while scheduler.has_work() or findley_load_step_jobs:
+            # Submit workloads for evaluation of Findley stress while there are free slots
+            while scheduler.has_work() and len(findley_load_step_jobs) < 2*num_workers:
+                a, b = scheduler.next_chunk()
+                if shared_memory:
+                    job_data = [a_cp_source, stress_source]
+                else:
+                    job_data = [findley_parameter_rows(a_cp, slice(a, b)),
+                                np.asarray(combined_stress[:, a:b, :], dtype=stress_dtype)]
+                findley_load_step_jobs.append((a, b, time.time(),
+                                               worker_pool.apply_async(findley_worker,
+                                                                       [job_data + [search_grid, engine,
+                                                                                    engine_options, (a, b)]])))
+
+            # Retrieve results for the completed workloads
+            finished_jobs = [job for job in findley_load_step_jobs if job[3].ready()]
+            if not finished_jobs:
+                for a, b, submit_time, findley_load_step_job in findley_load_step_jobs:
+                    if time.time() - submit_time > worker_run_out_time:
+                        raise multiprocessing.TimeoutError("Findley evaluation of rows %i to %i timed out" % (a, b))
+                time.sleep(0.005)
+            for job in finished_jobs:
+                findley_load_step_jobs.remove(job)
+                a, b, _, findley_load_step_job = job
+                job_results, job_time = findley_load_step_job.get()
+                scheduler.chunk_done(a, b, job_time)
+                if statistics:
+                    job_results, job_statistics = job_results
+                    engine_statistics.append((a, job_statistics))
+                fatigue_results[..., a:b, 0:5] = job_results
+                if completed_rows is not None:
+                    # Checkpoint, the results are written to file before the rows are marked as completed
+                    fatigue_results.flush()
+                    completed_rows[a:b] = True
+                    completed_rows.flush()
+                print(".",)
+                sys.stdout.flush()  # Force output of buffered content
         print("\n Done, Total Time: %1.2f" % (time.time() - s_time))
+        scheduler.report()
 
         # # Save to pickle dump file    
         # print " Pickle Findly stresses to file,",
@@ -51,125 +272,380 @@ def evaluate_findley(combined_stress, a_cp, worker_run_out_time, chunk_size, num
         # pickle.dump(fatigue_results,pickle_handle)
         # pickle_handle.close()
         # print "Done!"
+    finally:
+        if shared_directory:
+            shutil.rmtree(shared_directory, ignore_errors=True)
     if not w_pool:
         worker_pool.close()
         worker_pool.join()
+    if statistics:
+        return fatigue_results, np.vstack([job_statistics for _, job_statistics in sorted(engine_statistics,
+                                                                                          key=lambda job: job[0])])
     return fatigue_results
 
 
-# ----------------------------------------------------------------------------------------------------------------------
+class ChunkScheduler(object):
+    # Hands out the row ranges evaluated by the workers in evaluate_findley. Rows already marked in completed_rows are
+    # skipped. With adaptive_chunks the size of a chunk is chosen from the measured time per row so that a chunk takes
+    # about chunk_time seconds, but at most a share of the remaining rows such that every worker gets at least two more
+    # chunks, which keeps all workers busy until the end of the run
+    def __init__(self, rows, chunk_size, num_workers, adaptive_chunks=False, chunk_time=1.0, completed_rows=None):
+        self.rows = rows
+        self.chunk_size = chunk_size
+        self.num_workers = num_workers
+        self.adaptive_chunks = adaptive_chunks
+        self.chunk_time = chunk_time
+        self.min_chunk_size = max(1, chunk_size//16)
+        self.remaining_rows = np.ones(rows, dtype=bool)
+        if completed_rows is not None:
+            self.remaining_rows[np.asarray(completed_rows, dtype=bool)] = False
+        self.next_row = 0
+        self.unsubmitted_rows = int(np.sum(self.remaining_rows))
+        self.time_per_row = None
+        self.chunks = 0
+        self.busy_time = 0.
+        self.start_time = time.time()
+        self.last_submit_time = self.start_time
 
+    def has_work(self):
+        return self.unsubmitted_rows > 0
 
-def eval_findley(a_cp, stress_matrix, search_grid, mod=False):
-    def smallest_enclosing_circle(xp, yp, xo=None, yo=None):
-        # [xc, yc, R] = smallest_enclosing_circle(X, Y)
-        #
-        # Purpose:
-        # Calculate the Smallest Enclosing Circle of a set of points
-        #
-        # Input:  
-        # xp                       np array with X coordinates of the points, size: 1 x nr_points
-        # yp                       np array with Y coordinates of the points, size: 1 x nr_points
-        #
-        # Input used for recursive use only:
-        # xo                  array with 1, 2 or 3 X coordinates of outermost points, size: 1 x nr_outer_points
-        # yo                  array with 1, 2 or 3 Y coordinates of outermost points, size: 1 x nr_outer_points
-        #
-        # Output:
-        # xc                 X coordinate of smallest enclosing circle
-        # yc                 Y coordinate of smallest enclosing circle
-        # radius             radius of smallest enclosing circle
-        #
-        # History: 
-        # 14-Dec-2006 creation by FSta
-        #             based on an example by Yazan Ahed (yash78@gmail.com),
-        #             who based his code on a Java applet by Shripad Thite (http://heyoka.cs.uiuc.edu/~thite/mincircle/)
-
-        # Initialize xo, yo, nr_outer_points
-        if xo is None or yo is None:
-            xo = []
-            yo = []
-            nr_outer_points = 0
+    def _chunk_size(self):
+        if not self.adaptive_chunks:
+            return self.chunk_size
+        if self.time_per_row is None:
+            size = self.chunk_size
+        else:
+            size = int(self.chunk_time/max(self.time_per_row, 1e-12))
+        size = min(size, int(np.ceil(float(self.unsubmitted_rows)/(2*self.num_workers))))
+        return max(size, self.min_chunk_size)
+
+    def next_chunk(self):
+        while not self.remaining_rows[self.next_row]:
+            self.next_row += 1
+        a = self.next_row
+        if self.adaptive_chunks:
+            b = min(a + self._chunk_size(), self.rows)
+        else:
+            # Fixed chunks keep the boundaries at multiples of chunk_size
+            b = min((a//self.chunk_size + 1)*self.chunk_size, self.rows)
+        completed = np.nonzero(~self.remaining_rows[a:b])[0]
+        if completed.shape[0] > 0:
+            b = a + completed[0]
+        self.next_row = b
+        self.unsubmitted_rows -= b - a
+        self.chunks += 1
+        self.last_submit_time = time.time()
+        return a, b
+
+    def chunk_done(self, a, b, job_time):
+        # job_time is the time measured by the worker
+        self.busy_time += job_time
+        time_per_row = job_time/(b - a)
+        if self.time_per_row is None:
+            self.time_per_row = time_per_row
+        else:
+            self.time_per_row = 0.7*self.time_per_row + 0.3*time_per_row
+
+    def report(self):
+        total_time = time.time() - self.start_time
+        print(" Chunks: %i, pool occupancy: %1.1f %%, tail latency: %1.2f s" % (
+            self.chunks, 100*self.busy_time/max(self.num_workers*total_time, 1e-12),
+            time.time() - self.last_submit_time))
+
+
+def evaluate_findley_plane_parallel(combined_stress, a_cp, worker_run_out_time, num_workers=multiprocessing.cpu_count(),
+                                    w_pool=None, search_grid=5, engine_options=None):
+    # Findley evaluation where the set of planes is split in num_workers ranges which are evaluated by the workers for
+    # all rows with eval_findley_vectorized. The critical planes of the ranges are reduced here, if several ranges give
+    # the same Findley stress the plane with the lowest index is kept. The results are the same as for the 'vectorized'
+    # engine, and the 'loop' engine, and the evaluation scales with the number of workers also for a few rows
+    engine_options = dict(engine_options or {})
+    theta = _engine_plane_bank(search_grid, 'vectorized', engine_options).theta
+    s_time = time.time()
+    combined_stress = np.asarray(combined_stress, dtype=engine_options.get('dtype'))
+    load_steps, rows, _ = combined_stress.shape
+    plane_ranges = np.linspace(0, theta.shape[0], min(num_workers, theta.shape[0]) + 1).astype(int)
+    print(" Read %2i load steps with %i stress tensors" % (load_steps, rows))
+    print(" Splitting %i planes in %i ranges" % (theta.shape[0], plane_ranges.shape[0] - 1))
+
+    if not w_pool:
+        worker_pool = multiprocessing.Pool(processes=num_workers)
+    else:
+        worker_pool = w_pool
+    plane_jobs = []
+    for a, b in zip(plane_ranges[:-1], plane_ranges[1:]):
+        plane_jobs.append(worker_pool.apply_async(findley_worker,
+                                                  [[a_cp, combined_stress, search_grid, 'vectorized',
+                                                    dict(engine_options, plane_range=(a, b)), (0, rows)]]))
+    fatigue_results = None
+    for plane_job in plane_jobs:
+        job_results, _ = plane_job.get(worker_run_out_time)
+        if fatigue_results is None:
+            fatigue_results = job_results
         else:
-            nr_outer_points = np.size(xo)
-
-        # Compute new center point coordinates and radius
-        if nr_outer_points == 0:
-            xc = np.mean(xp)
-            yc = np.mean(yp)
-            radius = 0
-        elif nr_outer_points == 1:
-            xc = xo[0]
-            yc = yo[0]
-            radius = 0
-        elif nr_outer_points == 2:
-            xc = (xo[0] + xo[1]) / 2
-            yc = (yo[0] + yo[1]) / 2
-            radius = sqrt((xo[0] - xc) ** 2 + (yo[0] - yc) ** 2)
-
-        elif nr_outer_points == 3:
-            xc = (xo[2] ** 2 * (yo[0] - yo[1]) + (xo[0] ** 2 + (yo[0] - yo[1]) * (yo[0] - yo[2])) *
-                  (yo[1] - yo[2]) + xo[1] ** 2 * (-yo[0] + yo[2])) / (2 * (xo[2] * (yo[0] - yo[1]) +
-                                                                           xo[0] * (yo[1] - yo[2]) + xo[1] *
-                                                                           (-yo[0] + yo[2])))
-            yc = (yo[1] + yo[2]) / 2 - (xo[2] - xo[1]) / (yo[2] - yo[1]) * (xc - (xo[1] + xo[2]) / 2)
-            radius = sqrt((xo[0] - xc) ** 2 + (yo[0] - yc) ** 2)
-            return xc, yc, radius
+            # The ranges are reduced in plane order, ties are kept by the earlier range
+            update = job_results[..., 4] > fatigue_results[..., 4]
+            fatigue_results[update] = job_results[update]
+    print(" Done, Total Time: %1.2f" % (time.time() - s_time))
+    if not w_pool:
+        worker_pool.close()
+        worker_pool.join()
+    return fatigue_results
+
+
+def evaluate_findley_load_sweep(residual_stress, unit_load_history, load_multipliers, a_cp, worker_run_out_time,
+                                chunk_size, num_workers=multiprocessing.cpu_count(), w_pool=None, search_grid=5,
+                                engine_options=None, shared_memory=False, output_file=None, continuation=False,
+                                statistics=False):
+    # Findley evaluation of the stress histories
+    #     residual_stress + sum_u load_multipliers[i, u]*unit_load_history[u]
+    # for all load levels i in one pass over the planes, see eval_findley_load_sweep.
+    #   residual_stress     shape (rows, 6)
+    #   unit_load_history   shape (load_steps, rows, 6) or (unit_loads, load_steps, rows, 6)
+    #   load_multipliers    shape (levels,) or (levels, unit_loads)
+    # The results have the shape (levels, rows, 5), or (levels, parameters, rows, 5) if a_cp has the shape
+    # (parameters, rows)
+    # If continuation is True the critical plane of each row is followed from one load level to the next, see
+    # eval_findley_continuation, and the mean fraction of the planes evaluated and the number of rows which needed a
+    # global fallback are printed for each level. With statistics the statistics of eval_findley_continuation, shape
+    # (rows, levels, 2), are also returned
+    engine_options = dict(engine_options or {})
+    engine_options['load_multipliers'] = np.asarray(load_multipliers, dtype=float)
+    if statistics and (not continuation or output_file):
+        raise ValueError("Statistics are only available with continuation and without an output file")
+    if not continuation or output_file:
+        return evaluate_findley(pack_load_sweep(residual_stress, unit_load_history), a_cp, worker_run_out_time,
+                                chunk_size, num_workers=num_workers, w_pool=w_pool, search_grid=search_grid,
+                                engine='continuation' if continuation else 'load_sweep', engine_options=engine_options,
+                                shared_memory=shared_memory, output_file=output_file)
+
+    fatigue_results, evaluated_statistics = evaluate_findley(pack_load_sweep(residual_stress, unit_load_history), a_cp,
+                                                           worker_run_out_time, chunk_size, num_workers=num_workers,
+                                                           w_pool=w_pool, search_grid=search_grid,
+                                                           engine='continuation', engine_options=engine_options,
+                                                           statistics=True, shared_memory=shared_memory)
+    for level in range(evaluated_statistics.shape[1]):
+        print(" Load level %i: %1.1f %% of the planes evaluated, %i of %i rows needed a global fallback" % (
+            level, 100*np.mean(evaluated_statistics[:, level, 0]), np.sum(evaluated_statistics[:, level, 1]),
+            evaluated_statistics.shape[0]))
+    if statistics:
+        return fatigue_results, evaluated_statistics
+    return fatigue_results
+
+
+def principal_stresses(stress):
+    # Principal stresses in ascending order for stress tensors stored as [s11, s22, s33, s12, s13, s23] along the last
+    # axis
+    tensors = np.empty(stress.shape[:-1] + (3, 3))
+    for i, (j, k) in enumerate([(0, 0), (1, 1), (2, 2), (0, 1), (0, 2), (1, 2)]):
+        tensors[..., j, k] = stress[..., i]
+        tensors[..., k, j] = stress[..., i]
+    return np.linalg.eigvalsh(tensors)
+
+
+def validate_precision(fatigue_results, combined_stress, a_cp, search_grid, engine, engine_options, validation_rows):
+    # Evaluates validation_rows randomly chosen rows in double precision and prints the largest deviations of the
+    # normal stress, the shear stress amplitude and the Findley stress of fatigue_results from them. Returns the
+    # deviations
+    rows = combined_stress.shape[1]
+    sample = np.sort(np.random.choice(rows, min(validation_rows, rows), replace=False))
+    engine_options = dict(engine_options, dtype=np.float64)
+    engine_options.pop('return_statistics', None)
+    double_precision = _findley_engines[engine](findley_parameters(findley_parameter_rows(a_cp, sample)),
+                                                np.asarray(combined_stress[:, sample, :], dtype=np.float64),
+                                                search_grid, **engine_options)
+    deviation = np.abs(np.asarray(fatigue_results)[..., sample, 2:5] - double_precision[..., 2:5])
+    deviation = np.max(deviation.reshape(-1, 3), axis=0)
+    print(" Single precision validation on %i rows, largest deviations: sigma_n %.2e, tau_a %.2e, F %.2e" % (
+        sample.shape[0], deviation[0], deviation[1], deviation[2]))
+    return deviation
+
+
+def reduce_load_history(combined_stress, tolerance=1e-9):
+    # Reduces the load history of each row to the vertices of the convex hull of its path in the six dimensional stress
+    # space. The normal and shear stresses on a plane are linear in the stress tensor, the largest normal stress is
+    # therefore found at a vertex and the smallest circle enclosing the shear stresses is the one enclosing the shear
+    # stresses of the vertices. Critical plane criteria built from these, as the Findley criterion, thus give the same
+    # results for the reduced history. Identical steps and steps inside the hull are removed, a proportional history is
+    # reduced to its two end points.
+    #
+    # The path of a row is first expressed in the directions of its affine span, singular values below tolerance
+    # times the largest one are treated as zero, and the hull is computed in that space. Rows with fewer steps than
+    # needed for a hull in that space, or where the hull can not be computed, are kept as they are.
+    #
+    # Returns the reduced history, shape (reduced_load_steps, rows, 6), where rows with fewer vertices are padded by
+    # repeating their first vertex, and the number of kept steps for each row. The reduced history keeps the floating
+    # point type of combined_stress, the hull is always computed in double precision
+    dtype = np.asarray(combined_stress).dtype
+    if not np.issubdtype(dtype, np.floating):
+        dtype = np.float64
+    combined_stress = np.asarray(combined_stress, dtype=float)
+    load_steps, rows, _ = combined_stress.shape
+    path = np.swapaxes(combined_stress, 0, 1)
+    deviation = path - np.mean(path, axis=1)[:, None, :]
+    _, singular_values, directions = np.linalg.svd(deviation, full_matrices=False)
+    rank = np.sum(singular_values > tolerance*singular_values[:, 0:1], axis=1)
+    rank[singular_values[:, 0] == 0] = 0
+
+    kept = []
+    for row in range(rows):
+        if rank[row] == 0:
+            vertices = np.array([0])
+        elif rank[row] == 1:
+            coordinates = np.dot(deviation[row], directions[row, 0])
+            vertices = np.unique([np.argmin(coordinates), np.argmax(coordinates)])
         else:
-            print("warning... caught an unexpected mode... in elif 1")
-            raise RuntimeError
-
-        # Check if points are within the circle
-        for i, _ in enumerate(xp):
-            if (xp[i] - xc) ** 2 + (yp[i] - yc) ** 2 > radius ** 2:
-                if xo is not None or yo is not None:
-                    if not xp[i] in xo or not yp[i] in yo:
-                        if nr_outer_points == 0:
-                            xo = [xp[i]]
-                            yo = [yp[i]]
-                        elif nr_outer_points == 1:
-                            xo = [xo[0], xp[i]]
-                            yo = [yo[0], yp[i]]
-                        elif nr_outer_points == 2:
-                            xo = [xo[0], xo[1], xp[i]]
-                            yo = [yo[0], yo[1], yp[i]]
-                        else:
-                            print("warning... caught an unexpected mode... in elif 2")
-                            raise RuntimeError
-
-                        [xc, yc, radius] = smallest_enclosing_circle(xp[0:i + 1], yp[0:i + 1], xo, yo)
-
-        return xc, yc, radius
-
-    def get_transform_matrix(theta_deg, phi_deg):
-        # Radians
-        theta_r = pi * theta_deg / 180.0
-        phi_r = pi * phi_deg / 180.0
-
-        # Multiaxial fatigue, Marquis, Eq 1.3 & 1.5
-        a11 = cos(theta_r) * sin(phi_r)
-        a12 = sin(theta_r) * sin(phi_r)
-        a13 = cos(phi_r)
-        a21 = -sin(theta_r)
-        a22 = cos(theta_r)
-        a23 = 0
-        a31 = -cos(theta_r) * cos(phi_r)
-        a32 = -sin(theta_r) * cos(phi_r)
-        a33 = sin(phi_r)
-
-        # Compose transformation matrix
-        trans_matrix = np.array([[a11 ** 2, a12 ** 2, a13 ** 2, 2 * a11 * a12, 2 * a11 * a13, 2 * a13 * a12],
-                                 [a21 ** 2, a22 ** 2, a23 ** 2, 2 * a21 * a22, 2 * a21 * a23, 2 * a23 * a22],
-                                 [a31 ** 2, a32 ** 2, a33 ** 2, 2 * a31 * a32, 2 * a31 * a33, 2 * a33 * a32],
-                                 [a11 * a21, a12 * a22, a13 * a23, a11 * a22 + a12 * a21, a13 * a21 + a11 * a23,
-                                  a12 * a23 + a13 * a22],
-                                 [a11 * a31, a12 * a32, a13 * a33, a11 * a32 + a12 * a31, a13 * a31 + a11 * a33,
-                                  a13 * a32 + a12 * a33],
-                                 [a21 * a31, a22 * a32, a23 * a33, a21 * a32 + a22 * a31, a23 * a31 + a21 * a33,
-                                  a22 * a33 + a23 * a32]])
-        return trans_matrix
-
-        #     Search Space
+            vertices = np.arange(load_steps)
+            if load_steps > rank[row] + 1:
+                try:
+                    vertices = np.sort(ConvexHull(np.dot(deviation[row], directions[row, 0:rank[row]].T)).vertices)
+                except (ValueError, RuntimeError):
+                    pass
+        kept.append(vertices)
+
+    kept_steps = np.array([vertices.shape[0] for vertices in kept])
+    reduced_stress = np.empty((np.max(kept_steps), rows, 6), dtype=dtype)
+    for row, vertices in enumerate(kept):
+        reduced_stress[:, row, :] = combined_stress[vertices[0], row, :]
+        reduced_stress[0:vertices.shape[0], row, :] = combined_stress[vertices, row, :]
+    return reduced_stress, kept_steps
+
+
+def findley_upper_bound(combined_stress, a_cp):
+    # Upper bound of the Findley stress for each row, valid for every plane. The normal stress on a plane is never
+    # larger than the largest principal stress and never smaller than the smallest one. The shear stress on any plane
+    # from a stress tensor A is at most (s1 - s3)/2 of A. All shear stress vectors on a plane are therefore within
+    # max_t (s1 - s3)/2 of S(t) - S_mean from the shear stress vector of the mean stress S_mean, which bounds the
+    # radius of the smallest enclosing circle.
+    #
+    # Returns an array like the Findley results, [NaN, NaN, sigma_n bound, tau amplitude bound, F bound], where the
+    # normal stress bound is the largest principal stress over the history for a_cp >= 0 and the largest smallest
+    # principal stress over the history for a_cp < 0
+    principal = principal_stresses(combined_stress)
+    deviation = principal_stresses(combined_stress - np.mean(combined_stress, axis=0))
+    max_tau_amplitude = np.max(deviation[:, :, 2] - deviation[:, :, 0], axis=0)/2
+    a_cp = np.asarray(a_cp, dtype=float)
+    max_sigma_n = np.where(a_cp >= 0, np.max(principal[:, :, 2], axis=0), np.max(principal[:, :, 0], axis=0))
+
+    bound = np.empty(a_cp.shape + (5,))
+    bound[..., 0:2] = np.nan
+    bound[..., 2] = max_sigma_n
+    bound[..., 3] = max_tau_amplitude
+    bound[..., 4] = max_tau_amplitude + a_cp*max_sigma_n
+    return bound
+
+
+def screen_rows(bound, screen_threshold=None, screen_fraction=None):
+    # Rows where the Findley bound, shape (rows,) or (parameters, rows), for any parameter field is at least
+    # screen_threshold or among the fraction screen_fraction of the rows with the highest bounds
+    bound = np.max(np.asarray(bound).reshape(-1, np.shape(bound)[-1]), axis=0)
+    evaluated_rows = np.zeros(bound.shape[0], dtype=bool)
+    if screen_threshold is not None:
+        evaluated_rows[bound >= screen_threshold] = True
+    if screen_fraction is not None:
+        evaluated_rows[np.argsort(-bound)[:int(np.ceil(screen_fraction*bound.shape[0]))]] = True
+    return evaluated_rows
+
+
+def open_findley_output(output_file, result_shape, fingerprint=''):
+    # Memory mapped result array in output_file and the array of completed rows in the checkpoint file belonging to it.
+    # The fingerprint of the inputs, see findley_fingerprint, is stored in a file next to them. Existing files with the
+    # right shape and the same fingerprint are opened for resuming, otherwise new files are created
+    checkpoint_file = os.path.splitext(output_file)[0] + '_completed.npy'
+    fingerprint_file = os.path.splitext(output_file)[0] + '_fingerprint.txt'
+    if os.path.isfile(output_file) and os.path.isfile(checkpoint_file) and os.path.isfile(fingerprint_file):
+        fatigue_results = np.load(output_file, mmap_mode='r+')
+        completed_rows = np.load(checkpoint_file, mmap_mode='r+')
+        with open(fingerprint_file) as fingerprint_handle:
+            stored_fingerprint = fingerprint_handle.read().strip()
+        if fatigue_results.shape == tuple(result_shape) and completed_rows.shape == (result_shape[-2],) and \
+                stored_fingerprint == fingerprint:
+            print(" Resuming from checkpoint with %i of %i rows completed" % (np.sum(completed_rows),
+                                                                              completed_rows.shape[0]))
+            return fatigue_results, completed_rows
+        del fatigue_results, completed_rows
+        print(" The existing output file " + output_file + " does not match the evaluation and is overwritten")
+    fatigue_results = np.lib.format.open_memmap(output_file, mode='w+', dtype=float, shape=tuple(result_shape))
+    completed_rows = np.lib.format.open_memmap(checkpoint_file, mode='w+', dtype=bool, shape=(result_shape[-2],))
+    completed_rows[:] = False
+    completed_rows.flush()
+    with open(fingerprint_file, 'w') as fingerprint_handle:
+        fingerprint_handle.write(fingerprint + '\n')
+    return fatigue_results, completed_rows
+
+
+def findley_fingerprint(combined_stress, a_cp, search_grid, engine, engine_options, *other_values):
+    # SHA1 hash of the inputs determining the Findley results and of other_values, used to check that a checkpoint
+    # belongs to the same evaluation and as the key of the cached results in findley_cache
+    sha = hashlib.sha1()
+    if not isinstance(a_cp, FindleyParameterModel):
+        a_cp = np.asarray(a_cp, dtype=float)
+    for value in [findley_engine_version, np.asarray(combined_stress), a_cp, search_grid, engine,
+                  engine_options] + list(other_values):
+        _hash_value(sha, value)
+    return sha.hexdigest()
+
+
+def _hash_value(sha, value):
+    # Updates sha with value, numpy arrays are hashed by dtype, shape and data and containers element by element
+    if isinstance(value, np.ndarray):
+        sha.update(str((value.dtype.str, value.shape)).encode())
+        sha.update(np.ascontiguousarray(value).view(np.uint8).data)
+    elif isinstance(value, dict):
+        sha.update(b'dict')
+        for key in sorted(value.keys()):
+            _hash_value(sha, key)
+            _hash_value(sha, value[key])
+    elif isinstance(value, (list, tuple)):
+        sha.update(str((type(value).__name__, len(value))).encode())
+        for item in value:
+            _hash_value(sha, item)
+    elif value is None or isinstance(value, (bool, int, float, str, np.number)):
+        sha.update(repr(value).encode())
+    elif isinstance(value, type):
+        # Types, as the dtype in the engine options
+        sha.update(repr(value).encode())
+    else:
+        # Objects as the criteria of the 'criteria' engine are hashed by their class and attributes
+        sha.update(type(value).__name__.encode())
+        _hash_value(sha, getattr(value, '__dict__', {}))
+
+
+def _result_shape(a_cp, engine, engine_options):
+    # Leading dimensions of the result array from evaluate_findley
+    if engine in ['load_sweep', 'continuation']:
+        return (np.shape(engine_options['load_multipliers'])[0],) + _findley_parameter_shape(a_cp)[:-1]
+    return _findley_parameter_shape(a_cp)[:-1]
+
+
+def findley_parameters(a_cp):
+    # The Findley parameters as an array, computed from the material model if a_cp is a FindleyParameterModel
+    if isinstance(a_cp, FindleyParameterModel):
+        return np.asarray(a_cp.material.findley_k(a_cp.steel_data), dtype=float)
+    return np.asarray(a_cp)
+
+
+def findley_parameter_rows(a_cp, rows):
+    # The Findley parameters of the rows given by a slice or an index array, a FindleyParameterModel is returned for the
+    # rows if a_cp is a model
+    if isinstance(a_cp, FindleyParameterModel):
+        return a_cp._replace(steel_data=type(a_cp.steel_data)(*[np.asarray(field)[rows] for field in a_cp.steel_data]))
+    return np.asarray(a_cp)[..., rows]
+
+
+def _findley_parameter_shape(a_cp):
+    if isinstance(a_cp, FindleyParameterModel):
+        rows = np.shape(a_cp.steel_data[0])[0]
+        return findley_parameters(findley_parameter_rows(a_cp, slice(0, 1))).shape[:-1] + (rows,)
+    return np.shape(a_cp)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+
+def eval_findley(a_cp, stress_matrix, search_grid, mod=False):
+    #     Search Space
 
     phi_space = 90
     theta_space = 180
@@ -183,23 +659,29 @@ def eval_findley(a_cp, stress_matrix, search_grid, mod=False):
     # Result array [theta, phi, max_sigma_n, max_tau_amplitude, F]
     findley_vec = np.zeros((points, 5))
 
+    # Transformation matrices of the planes in the order of the loops below, see plane_bank
+    transform_matrices = plane_bank(search_grid).transform_matrices
+
     # Loop over all planes 
     first_run = True  # The first time, do not compare just store data
+    plane = 0
     for theta in range(0, theta_space + search_grid, search_grid):
         for phi in range(-phi_space, phi_space + search_grid, search_grid):
 
-            # Compute the transformation matrix for the considered plane
-            q = get_transform_matrix(theta, phi)
+            # The transformation matrix for the considered plane
+            q = transform_matrices[plane]
+            plane += 1
+
+            # Shear and normal stresses on the plane for the load history of all nodes and the shear stress amplitudes,
+            # the radii of the smallest enclosing circles, for all nodes at once
+            plane_stresses = np.dot(stress_matrix, q.T)
+            _, _, tau_amplitudes = smallest_enclosing_circles(plane_stresses[:, :, 3].T, plane_stresses[:, :, 4].T)
 
             j = 0  # Iterator
             # For the currently considered planed, evaluate sigma_n, tau_1, tau_2, 
             # Delta_tau, F for every node for the load history (time domain)
-            for node_s_hist_vector in np.rollaxis(stress_matrix, 1):  # Loop over the stress history for a specific node
-                # Compute shear stress and normal stresses for the load history
-                s_prim = np.dot(node_s_hist_vector, q.T)
-                # Evaluate the smallest enclosing circle to get the shear stress amplitude 
-                # (i.e. the radius of the circle)
-                x, y, max_tau_amplitude = smallest_enclosing_circle(s_prim[:, 3], s_prim[:, 4])
+            for s_prim in np.rollaxis(plane_stresses, 1):  # Loop over the stress history for a specific node
+                max_tau_amplitude = tau_amplitudes[j]
 
                 # Evaluate the largest normal stress on the plane for the load history
                 max_sigma_n = s_prim[:, 0].max()
@@ -238,14 +720,873 @@ def eval_findley(a_cp, stress_matrix, search_grid, mod=False):
 # ----------------------------------------------------------------------------------------------------------------------
 
 
+def plane_grid(search_grid):
+    # Angles (degrees) of the planes searched by eval_findley, in the same order as the loops in eval_findley
+    theta, phi = np.meshgrid(np.arange(0, 180 + search_grid, search_grid),
+                             np.arange(-90, 90 + search_grid, search_grid), indexing='ij')
+    return theta.flatten().astype(float), phi.flatten().astype(float)
+
+
+def get_transform_matrices(theta_deg, phi_deg):
+    # Transformation matrices of the stress tensor for arrays of planes, shape (planes, 6, 6).
+    # Multiaxial fatigue, Marquis, Eq 1.3 & 1.5
+    theta_r = np.pi*np.asarray(theta_deg, dtype=float)/180.
+    phi_r = np.pi*np.asarray(phi_deg, dtype=float)/180.
+    return _transform_matrices(np.cos(theta_r), np.sin(theta_r), np.cos(phi_r), np.sin(phi_r))
+
+
+def _transform_matrices(cos_theta, sin_theta, cos_phi, sin_phi):
+    a11 = cos_theta*sin_phi
+    a12 = sin_theta*sin_phi
+    a13 = cos_phi
+    a21 = -sin_theta
+    a22 = cos_theta
+    a23 = 0*cos_theta
+    a31 = -cos_theta*cos_phi
+    a32 = -sin_theta*cos_phi
+    a33 = sin_phi
+
+    trans_matrix = np.empty((cos_theta.shape[0], 6, 6))
+    trans_matrix[:, 0, :] = np.array([a11**2, a12**2, a13**2, 2*a11*a12, 2*a11*a13, 2*a13*a12]).T
+    trans_matrix[:, 1, :] = np.array([a21**2, a22**2, a23**2, 2*a21*a22, 2*a21*a23, 2*a23*a22]).T
+    trans_matrix[:, 2, :] = np.array([a31**2, a32**2, a33**2, 2*a31*a32, 2*a31*a33, 2*a33*a32]).T
+    trans_matrix[:, 3, :] = np.array([a11*a21, a12*a22, a13*a23, a11*a22 + a12*a21, a13*a21 + a11*a23,
+                                      a12*a23 + a13*a22]).T
+    trans_matrix[:, 4, :] = np.array([a11*a31, a12*a32, a13*a33, a11*a32 + a12*a31, a13*a31 + a11*a33,
+                                      a13*a32 + a12*a33]).T
+    trans_matrix[:, 5, :] = np.array([a21*a31, a22*a32, a23*a33, a21*a32 + a22*a31, a23*a31 + a21*a33,
+                                      a22*a33 + a23*a32]).T
+    return trans_matrix
+
+
+def _outside_circle(dist2, r2, scale2):
+    # Points outside a circle, a small tolerance is needed for the points defining the circle. The tolerance is
+    # increased for single precision
+    eps = 16*np.finfo(dist2.dtype).eps
+    return dist2 > r2*(1 + max(1e-9, eps)) + max(1e-12, eps)*scale2
+
+
+def _support_circles(x, y, scale2):
+    # Smallest enclosing circles of a few points, shape (point sets, points). All circles with two of the points on a
+    # diameter and all circles through three of the points are candidates and the smallest candidate enclosing all the
+    # points is chosen. Collinear triplets are left to the two point circles.
+    # Returns xc, yc, radius**2 and the indices of the points defining the circles, shape (point sets, 3)
+    n = x.shape[1]
+    pairs = [(i, j, j) for i in range(n) for j in range(i + 1, n)]
+    triplets = [(i, j, k) for i in range(n) for j in range(i + 1, n) for k in range(j + 1, n)]
+    support = np.array(pairs + triplets)
+    pairs = support[:len(pairs)]
+    triplets = support[len(pairs):]
+
+    # Circles with two points on a diameter
+    cx = (x[:, pairs[:, 0]] + x[:, pairs[:, 1]])/2
+    cy = (y[:, pairs[:, 0]] + y[:, pairs[:, 1]])/2
+    r2 = (x[:, pairs[:, 0]] - cx)**2 + (y[:, pairs[:, 0]] - cy)**2
+    if len(triplets):
+        # Circumscribed circles of three points
+        ax, bx, cx3 = x[:, triplets[:, 0]], x[:, triplets[:, 1]], x[:, triplets[:, 2]]
+        ay, by, cy3 = y[:, triplets[:, 0]], y[:, triplets[:, 1]], y[:, triplets[:, 2]]
+        d = 2*(ax*(by - cy3) + bx*(cy3 - ay) + cx3*(ay - by))
+        degenerated = d == 0
+        d[degenerated] = 1.
+        ux = ((ax**2 + ay**2)*(by - cy3) + (bx**2 + by**2)*(cy3 - ay) + (cx3**2 + cy3**2)*(ay - by))/d
+        uy = ((ax**2 + ay**2)*(cx3 - bx) + (bx**2 + by**2)*(ax - cx3) + (cx3**2 + cy3**2)*(bx - ax))/d
+        ux[degenerated] = np.nan
+        uy[degenerated] = np.nan
+        cx = np.hstack((cx, ux))
+        cy = np.hstack((cy, uy))
+        r2 = np.hstack((r2, (ax - ux)**2 + (ay - uy)**2))
+
+    dist2 = (x[:, None, :] - cx[:, :, None])**2 + (y[:, None, :] - cy[:, :, None])**2
+    valid = np.all(~_outside_circle(dist2, r2[:, :, None], scale2[:, None, None]), axis=2)
+    r2[np.logical_or(~valid, np.isnan(r2))] = np.inf
+    idx = np.argmin(r2, axis=1)
+    rows = np.arange(x.shape[0])
+    return cx[rows, idx], cy[rows, idx], r2[rows, idx], support[idx]
+
+
+def plane_normals(theta_deg, phi_deg):
+    # Unit normals of the planes, the first row of the direction cosines in get_transform_matrices
+    theta_r = np.pi*np.asarray(theta_deg, dtype=float)/180.
+    phi_r = np.pi*np.asarray(phi_deg, dtype=float)/180.
+    return np.stack((np.cos(theta_r)*np.sin(phi_r), np.sin(theta_r)*np.sin(phi_r), np.cos(phi_r)), axis=-1)
+
+
+def plane_angles(normals):
+    # Angles theta in [0, 180) and phi in [-90, 90] of planes with the given unit normals, inverse of plane_normals.
+    # n and -n are the same plane and the normal is chosen with a positive z-component
+    normals = np.asarray(normals, dtype=float)
+    normals = normals*np.where(normals[..., 2:3] < 0, -1., 1.)
+    theta = np.arctan2(normals[..., 1], normals[..., 0])*180/np.pi
+    phi = np.arccos(np.clip(normals[..., 2], -1., 1.))*180/np.pi
+    negative = theta < 0
+    theta[negative] += 180
+    phi[negative] *= -1
+    return theta, phi
+
+
+def _unique_plane_indices(theta, phi):
+    # Indices of the first occurrence of each physical plane, planes with the same normal or opposite normals are equal
+    normals = plane_normals(theta, phi)
+    # For normals in the xy-plane the sign is fixed by the first non-zero component
+    normals[np.abs(normals) < 1e-12] = 0.
+    sign = np.where(normals[:, 2] != 0, normals[:, 2], np.where(normals[:, 1] != 0, normals[:, 1], normals[:, 0]))
+    normals *= np.sign(sign)[:, None]
+    _, idx = np.unique(np.round(normals, 9), axis=0, return_index=True)
+    return np.sort(idx)
+
+
+def spiral_planes(num_planes):
+    # Nearly uniform sampling of the plane normals on the unit hemisphere with a Fibonacci spiral. No normal lies on
+    # the equator so every plane is sampled only once
+    k = np.arange(num_planes) + 0.5
+    z = 1 - k/num_planes
+    r = np.sqrt(1 - z**2)
+    psi = np.pi*(3 - np.sqrt(5))*k
+    return plane_angles(np.vstack((r*np.cos(psi), r*np.sin(psi), z)).T)
+
+
+def plane_set(search_grid, sampling='grid', num_planes=None):
+    # Angles theta and phi of the planes searched for the critical plane
+    #   'grid'          The planes of eval_findley with the angle step search_grid in theta and phi
+    #   'unique_grid'   The planes of 'grid' with duplicated planes removed, the order of the planes is kept
+    #   'spiral'        num_planes nearly uniformly distributed planes, see spiral_planes. If num_planes is None the
+    #                   number of planes is chosen to give the angular spacing search_grid
+    if sampling == 'grid':
+        return plane_grid(search_grid)
+    if sampling == 'unique_grid':
+        theta, phi = plane_grid(search_grid)
+        idx = _unique_plane_indices(theta, phi)
+        return theta[idx], phi[idx]
+    if sampling == 'spiral':
+        if num_planes is None:
+            num_planes = int(round(2*np.pi/(np.pi*search_grid/180)**2))
+        return spiral_planes(num_planes)
+    raise ValueError("Unknown plane sampling " + str(sampling) + ", valid samplings are grid, unique_grid and spiral")
+
+
+def plane_bank(search_grid, sampling='grid', num_planes=None):
+    # The planes of plane_set with their normals, transformation matrices, shape (planes, 6, 6), and the rows
+    # [0, 3, 4] of the matrices giving sigma_n, tau_1 and tau_2, shape (planes, 3, 6). A bank is built once per process
+    # and plane set and kept in _plane_banks, its arrays are read only. evaluate_findley builds the bank before the
+    # worker pool is created so that forked workers share it. The trigonometric functions are evaluated with math as
+    # in the original eval_findley, which gives exactly the same matrices for the 'grid' planes
+    key = (search_grid, sampling, num_planes)
+    if key not in _plane_banks:
+        theta, phi = plane_set(search_grid, sampling, num_planes)
+        theta_r = [pi*angle/180.0 for angle in theta]
+        phi_r = [pi*angle/180.0 for angle in phi]
+        transform_matrices = _transform_matrices(np.array([cos(angle) for angle in theta_r]),
+                                                 np.array([sin(angle) for angle in theta_r]),
+                                                 np.array([cos(angle) for angle in phi_r]),
+                                                 np.array([sin(angle) for angle in phi_r]))
+        bank = PlaneBank(theta=theta, phi=phi, normals=plane_normals(theta, phi),
+                         transform_matrices=transform_matrices,
+                         transform_rows=np.ascontiguousarray(transform_matrices[:, [0, 3, 4], :]))
+        for array in bank:
+            array.setflags(write=False)
+        _plane_banks[key] = bank
+    return _plane_banks[key]
+
+
+def _engine_plane_bank(search_grid, engine, engine_options):
+    # Builds the plane bank used by an engine of evaluate_findley
+    if engine == 'loop':
+        return plane_bank(search_grid)
+    return plane_bank(search_grid, engine_options.get('sampling', 'grid'), engine_options.get('num_planes', None))
+
+
+def plane_spacing(num_planes):
+    # Mean angular spacing in degrees between num_planes uniformly distributed planes
+    return np.sqrt(2*np.pi/num_planes)*180/np.pi
+
+
+def smallest_enclosing_circles(xp, yp):
+    # Smallest enclosing circles for many point sets at once. The points are stored along the last axis of xp and yp
+    # and the circles are returned as xc, yc, radius with the shape of the remaining axes.
+    #
+    # For two points the circle has the points on a diameter. Longer point sets are solved with the farthest point
+    # iteration of Elzinga and Hearn. The circle of a support set of two or three points is checked against all points
+    # and the point farthest outside the circle is added to the support set which is then reduced to the points
+    # defining the smallest circle enclosing it. The radius grows for every iteration and each iteration is one pass
+    # over the points, made for all unfinished point sets at once.
+    # The circles are computed in single precision if xp and yp are float32 arrays and in double precision otherwise
+    xp = np.asarray(xp)
+    yp = np.asarray(yp)
+    if xp.dtype != np.float32 or yp.dtype != np.float32:
+        xp = xp.astype(float)
+        yp = yp.astype(float)
+    shape = xp.shape[:-1]
+    n = xp.shape[-1]
+    xp = xp.reshape(-1, n)
+    yp = yp.reshape(-1, n)
+
+    if n == 1:
+        return xp[:, 0].reshape(shape), yp[:, 0].reshape(shape), np.zeros(shape)
+    if n == 2:
+        radius = np.sqrt((xp[:, 1] - xp[:, 0])**2 + (yp[:, 1] - yp[:, 0])**2)/2
+        return ((xp[:, 0] + xp[:, 1])/2).reshape(shape), ((yp[:, 0] + yp[:, 1])/2).reshape(shape), radius.reshape(shape)
+
+    rows = np.arange(xp.shape[0])
+    scale2 = (np.max(xp, 1) - np.min(xp, 1))**2 + (np.max(yp, 1) - np.min(yp, 1))**2
+
+    # Start with the first point and the point farthest away from it on a diameter
+    farthest = np.argmax((xp - xp[:, :1])**2 + (yp - yp[:, :1])**2, axis=1)
+    support = np.vstack((0*farthest, farthest, farthest)).T
+    xc = (xp[:, 0] + xp[rows, farthest])/2
+    yc = (yp[:, 0] + yp[rows, farthest])/2
+    r2 = (xp[:, 0] - xc)**2 + (yp[:, 0] - yc)**2
+
+    active = rows
+    for _ in range(2*n + 10):
+        dist2 = (xp[active] - xc[active, None])**2 + (yp[active] - yc[active, None])**2
+        farthest = np.argmax(dist2, axis=1)
+        outside = _outside_circle(dist2[np.arange(active.shape[0]), farthest], r2[active], scale2[active])
+        active = active[outside]
+        if active.shape[0] == 0:
+            break
+        points = np.hstack((support[active], farthest[outside, None]))
+        xc[active], yc[active], r2[active], new_support = _support_circles(xp[active[:, None], points],
+                                                                           yp[active[:, None], points],
+                                                                           scale2[active])
+        support[active] = points[np.arange(active.shape[0])[:, None], new_support]
+    else:
+        # The iteration did not converge for the remaining point sets, their circles are enlarged around the last
+        # centers to enclose all points. The circles then enclose the points but may not be the smallest ones
+        dist2 = np.max((xp[active] - xc[active, None])**2 + (yp[active] - yc[active, None])**2, axis=1)
+        if np.any(dist2 > r2[active]):
+            print("Warning: the smallest enclosing circle iteration did not converge for %i point sets, enclosing "
+                  "circles which may be too large are used" % np.sum(dist2 > r2[active]))
+            r2[active] = np.maximum(r2[active], dist2)
+    return xc.reshape(shape), yc.reshape(shape), np.sqrt(r2).reshape(shape)
+
+
+def _critical_plane_stresses(stress_matrix, transform_rows):
+    # Normal stress and the two shear stresses on the planes defined by transform_rows, shape (planes, 3, 6), for all
+    # nodes and load steps. Returns an array of shape (planes, 3, nodes, load_steps)
+    load_steps, points, _ = stress_matrix.shape
+    node_histories = np.swapaxes(stress_matrix, 0, 1).reshape(points*load_steps, 6)
+    plane_stresses = np.dot(transform_rows.reshape(-1, 6), node_histories.T)
+    return plane_stresses.reshape(transform_rows.shape[0], 3, points, load_steps)
+
+
+def _plane_quantities(stress_matrix, transform_rows):
+    # Largest normal stress and shear stress amplitude, shape (planes, nodes), for the planes in transform_rows
+    if stress_matrix.shape[0] == 2:
+        # Two load steps, the shear stress amplitude is half the change of the shear stress vector and only the change
+        # of the stress needs to be transformed
+        sigma_n = np.dot(transform_rows[:, 0, :], stress_matrix.reshape(-1, 6).T)
+        sigma_n = sigma_n.reshape(transform_rows.shape[0], 2, stress_matrix.shape[1])
+        delta_tau = np.dot(transform_rows[:, 1:, :].reshape(-1, 6), (stress_matrix[1] - stress_matrix[0]).T)
+        delta_tau = delta_tau.reshape(transform_rows.shape[0], 2, stress_matrix.shape[1])
+        return np.maximum(sigma_n[:, 0], sigma_n[:, 1]), np.sqrt(delta_tau[:, 0]**2 + delta_tau[:, 1]**2)/2
+
+    plane_stresses = _critical_plane_stresses(stress_matrix, transform_rows)
+    _, _, max_tau_amplitude = smallest_enclosing_circles(plane_stresses[:, 1], plane_stresses[:, 2])
+    return np.max(plane_stresses[:, 0], axis=-1), max_tau_amplitude
+
+
+def _update_critical_planes(findley_vec, critical_plane, a_cp, max_sigma_n, max_tau_amplitude, first_plane):
+    # Updates findley_vec, shape (parameters, nodes, 5), and the index of the critical plane, shape (parameters, nodes),
+    # with the planes first_plane, first_plane + 1, ... for which the quantities, shape (planes, nodes), are given.
+    # a_cp has the shape (parameters, nodes)
+    parameters, points = a_cp.shape
+    findley_stress = max_tau_amplitude[None, :, :] + a_cp[:, None, :]*max_sigma_n[None, :, :]
+
+    # The first plane with the largest Findley stress is the critical one, as in eval_findley
+    idx = np.argmax(findley_stress, axis=1)
+    k, n = np.meshgrid(np.arange(parameters), np.arange(points), indexing='ij')
+    update = findley_stress[k, idx, n] > findley_vec[:, :, 4]
+    critical_plane[update] = first_plane + idx[update]
+    findley_vec[update, 2] = max_sigma_n[idx, n][update]
+    findley_vec[update, 3] = max_tau_amplitude[idx, n][update]
+    findley_vec[update, 4] = findley_stress[k, idx, n][update]
+
+
+def _critical_plane_angles(findley_vec, critical_plane, theta, phi, legacy_order=False):
+    findley_vec[..., 0] = phi[critical_plane]
+    findley_vec[..., 1] = theta[critical_plane]
+    if legacy_order:
+        # eval_findley stores the angles in the order theta, phi if the first plane is the critical one
+        first_plane = critical_plane == 0
+        findley_vec[first_plane, 0] = theta[0]
+        findley_vec[first_plane, 1] = phi[0]
+
+
+def _parameter_fields(a_cp, points, dtype=float):
+    # a_cp as an array of shape (parameters, nodes) and the shape of the results
+    a_cp = np.asarray(a_cp, dtype=dtype)
+    return a_cp.reshape(-1, points), a_cp.shape[:-1] + (points, 5)
+
+
+def eval_findley_vectorized(a_cp, stress_matrix, search_grid, plane_batch_size=64, sampling='grid', num_planes=None,
+                            plane_range=None, dtype=np.float64):
+    # Evaluates the same planes as eval_findley and returns the same result array but transforms the stress history of
+    # all nodes for a batch of planes in one matrix product instead of looping over planes and nodes.
+    # Other sets of planes are chosen by sampling and num_planes, see plane_set. If plane_range=(start, stop) is given
+    # only the planes with these indices in the plane set are evaluated. With dtype=np.float32 the stresses on the
+    # planes, the enclosing circles and the Findley stresses are computed in single precision
+    #
+    # a_cp can also have the shape (parameters, nodes), the results then have the shape (parameters, nodes, 5) and the
+    # stresses on the planes are only computed once for all parameters
+    theta, phi, _, _, transform_rows = plane_bank(search_grid, sampling, num_planes)
+    stress_matrix = np.asarray(stress_matrix, dtype=dtype)
+    transform_rows = transform_rows.astype(dtype, copy=False)
+
+    loadsteps, points, no_stress_components = stress_matrix.shape
+    a_cp, shape = _parameter_fields(a_cp, points, dtype)
+
+    # Result array [phi, theta, max_sigma_n, max_tau_amplitude, F]
+    findley_vec = np.zeros((a_cp.shape[0], points, 5))
+    findley_vec[:, :, 4] = -np.inf
+    critical_plane = np.zeros((a_cp.shape[0], points), dtype=int)
+    start, stop = plane_range or (0, theta.shape[0])
+    for a in range(start, stop, plane_batch_size):
+        max_sigma_n, max_tau_amplitude = _plane_quantities(stress_matrix,
+                                                           transform_rows[a:min(a + plane_batch_size, stop)])
+        _update_critical_planes(findley_vec, critical_plane, a_cp, max_sigma_n, max_tau_amplitude, a)
+
+    _critical_plane_angles(findley_vec, critical_plane, theta, phi, legacy_order=sampling == 'grid')
+    return findley_vec.reshape(shape)
+
+
+def critical_plane_quantities(stress_matrix, search_grid, sampling='grid', num_planes=None, plane_batch_size=64):
+    # The largest normal stress and the shear stress amplitude on every plane for every node, shape (planes, nodes),
+    # together with the angles theta and phi of the planes. The quantities do not depend on the Findley parameter and
+    # findley_from_plane_quantities evaluates the Findley stress from them for any number of parameter fields
+    theta, phi, _, _, transform_rows = plane_bank(search_grid, sampling, num_planes)
+    max_sigma_n = np.empty((theta.shape[0], stress_matrix.shape[1]))
+    max_tau_amplitude = np.empty((theta.shape[0], stress_matrix.shape[1]))
+    for a in range(0, theta.shape[0], plane_batch_size):
+        max_sigma_n[a:a + plane_batch_size], max_tau_amplitude[a:a + plane_batch_size] = \
+            _plane_quantities(stress_matrix, transform_rows[a:a + plane_batch_size])
+    return theta, phi, max_sigma_n, max_tau_amplitude
+
+
+def findley_from_plane_quantities(a_cp, theta, phi, max_sigma_n, max_tau_amplitude):
+    # Findley results [phi, theta, max_sigma_n, max_tau_amplitude, F] from the output of critical_plane_quantities.
+    # a_cp has the shape (nodes,) or (parameters, nodes) and the results the shape (nodes, 5) or (parameters, nodes, 5)
+    a_cp, shape = _parameter_fields(a_cp, max_sigma_n.shape[1])
+    findley_vec = np.zeros((a_cp.shape[0], max_sigma_n.shape[1], 5))
+    findley_vec[:, :, 4] = -np.inf
+    critical_plane = np.zeros((a_cp.shape[0], max_sigma_n.shape[1]), dtype=int)
+    _update_critical_planes(findley_vec, critical_plane, a_cp, max_sigma_n, max_tau_amplitude, 0)
+    _critical_plane_angles(findley_vec, critical_plane, theta, phi)
+    return findley_vec.reshape(shape)
+
+
+def _shear_stress_amplitude(tau_1, tau_2):
+    # Shear stress amplitude from the shear stress components on the planes, shape (planes, load_steps, nodes)
+    if tau_1.shape[1] == 2:
+        return np.sqrt((tau_1[:, 1] - tau_1[:, 0])**2 + (tau_2[:, 1] - tau_2[:, 0])**2)/2
+    _, _, radius = smallest_enclosing_circles(np.swapaxes(tau_1, 1, 2), np.swapaxes(tau_2, 1, 2))
+    return radius
+
+
+def pack_load_sweep(residual_stress, unit_load_history):
+    # Stores the residual stress, shape (nodes, 6), and the unit load histories, shape (load_steps, nodes, 6) or
+    # (unit_loads, load_steps, nodes, 6), in one array of shape (1 + unit_loads*load_steps, nodes, 6) which is chunked
+    # over the nodes as an ordinary stress history by evaluate_findley
+    points = residual_stress.shape[0]
+    unit_load_history = np.asarray(unit_load_history, dtype=float).reshape(-1, points, 6)
+    return np.concatenate((np.asarray(residual_stress, dtype=float)[None, :, :], unit_load_history), axis=0)
+
+
+def eval_findley_load_sweep(a_cp, stress_matrix, search_grid, load_multipliers, plane_batch_size=64, sampling='grid',
+                            num_planes=None, dtype=np.float64):
+    # Findley evaluation for many load levels of a stress history of the form
+    #     residual_stress + sum_u load_multipliers[i, u]*unit_load_history[u]
+    # with stress_matrix from pack_load_sweep. The transformation to the planes is linear and the residual stress and
+    # the unit load histories are transformed once, the stresses on the planes for each load level are then linear
+    # combinations of them. The planes are the same as for eval_findley_vectorized and the results have the shape
+    # (levels, nodes, 5), or (levels, parameters, nodes, 5) if a_cp has the shape (parameters, nodes). dtype is the
+    # precision of the computations, see eval_findley_vectorized
+    theta, phi, _, _, transform_rows = plane_bank(search_grid, sampling, num_planes)
+    stress_matrix = np.asarray(stress_matrix, dtype=dtype)
+    transform_rows = transform_rows.astype(dtype, copy=False)
+
+    load_multipliers = np.asarray(load_multipliers, dtype=dtype)
+    load_multipliers = load_multipliers.reshape(load_multipliers.shape[0], -1)
+    levels, unit_loads = load_multipliers.shape
+    packed_steps, points, _ = stress_matrix.shape
+    load_steps = (packed_steps - 1)//unit_loads
+    a_cp, shape = _parameter_fields(a_cp, points, dtype)
+
+    findley_vec = np.zeros((levels, a_cp.shape[0], points, 5))
+    findley_vec[:, :, :, 4] = -np.inf
+    critical_plane = np.zeros((levels, a_cp.shape[0], points), dtype=int)
+    for a in range(0, theta.shape[0], plane_batch_size):
+        rows = transform_rows[a:a + plane_batch_size]
+        planes = rows.shape[0]
+        residual = np.dot(rows.reshape(-1, 6), stress_matrix[0].T).reshape(planes, 3, points)
+        unit = np.dot(rows.reshape(-1, 6), stress_matrix[1:].reshape(-1, 6).T)
+        unit = unit.reshape(planes, 3, unit_loads, load_steps, points)
+        if unit_loads == 1:
+            # The residual stress only moves the shear stress path and the amplitude is proportional to the load
+            unit_tau_amplitude = _shear_stress_amplitude(unit[:, 1, 0], unit[:, 2, 0])
+        elif load_steps == 2:
+            # Only the change of the shear stresses is needed for the amplitude
+            unit_sigma_n = np.ascontiguousarray(np.swapaxes(unit[:, 0], 0, 1))
+            unit_delta_tau = np.ascontiguousarray(np.transpose(unit[:, 1:, :, 1] - unit[:, 1:, :, 0], (2, 0, 1, 3)))
+
+        for level in range(levels):
+            if unit_loads == 1:
+                max_sigma_n = residual[:, 0] + np.max(load_multipliers[level, 0]*unit[:, 0, 0], axis=1)
+                max_tau_amplitude = abs(load_multipliers[level, 0])*unit_tau_amplitude
+            elif load_steps == 2:
+                sigma_n = residual[:, 0, None, :] + load_multipliers[level, 0]*unit_sigma_n[0]
+                delta_tau = load_multipliers[level, 0]*unit_delta_tau[0]
+                for u in range(1, unit_loads):
+                    sigma_n += load_multipliers[level, u]*unit_sigma_n[u]
+                    delta_tau += load_multipliers[level, u]*unit_delta_tau[u]
+                max_sigma_n = np.max(sigma_n, axis=1)
+                max_tau_amplitude = np.sqrt(delta_tau[:, 0]**2 + delta_tau[:, 1]**2)/2
+            else:
+                plane_stresses = residual[:, :, None, :] + load_multipliers[level, 0]*unit[:, :, 0]
+                for u in range(1, unit_loads):
+                    plane_stresses += load_multipliers[level, u]*unit[:, :, u]
+                max_sigma_n = np.max(plane_stresses[:, 0], axis=1)
+                max_tau_amplitude = _shear_stress_amplitude(plane_stresses[:, 1], plane_stresses[:, 2])
+            _update_critical_planes(findley_vec[level], critical_plane[level], a_cp, max_sigma_n, max_tau_amplitude, a)
+
+    _critical_plane_angles(findley_vec, critical_plane, theta, phi, legacy_order=sampling == 'grid')
+    return findley_vec.reshape((levels,) + shape)
+
+
+def eval_findley_continuation(a_cp, stress_matrix, search_grid, load_multipliers, neighbourhood=None,
+                              return_statistics=False, plane_batch_size=64, sampling='grid', num_planes=None):
+    # Findley evaluation of the load levels of eval_findley_load_sweep where the critical plane of each node is
+    # followed from one load level to the next. This pays off when eval_findley_load_sweep needs the smallest enclosing
+    # circles on every plane for every level, that is for several unit loads with more than two load steps. Other
+    # histories are evaluated by eval_findley_load_sweep, which then only needs cheap operations per level.
+    #
+    # The first level is evaluated on all planes. After that an upper bound of the Findley stress of every node on
+    # every plane is carried from level to level. The largest normal stress and the radius of the smallest enclosing
+    # circle of the shear stresses are subadditive, and a change d of the multiplier of unit load u can increase the
+    # Findley stress on a plane by at most
+    #     |d|*tau_amplitude_u + max_t(a_cp*d*sigma_n_u(t))
+    # where tau_amplitude_u and sigma_n_u(t) belong to the unit load history on that plane. For each level the planes
+    # within the angle neighbourhood (degrees) of the previous critical plane are evaluated first, and then every plane
+    # whose bound is not below the largest Findley stress found. The bound of an evaluated plane is set to its Findley
+    # stress. No plane that can be critical is skipped, so the results are those of eval_findley_load_sweep up to
+    # round-off. neighbourhood defaults to twice the plane spacing and the results have the shape (levels, nodes, 5).
+    # If return_statistics is True an array of shape (nodes, levels, 2) is also returned with the fraction of the
+    # planes evaluated for each node and level and a 1 where a node evaluated planes outside the neighbourhood, a global
+    # fallback, and 0 otherwise. The first level is evaluated on all planes and is not counted as a fallback
+    theta, phi, normals, _, transform_rows = plane_bank(search_grid, sampling, num_planes)
+    load_multipliers = np.asarray(load_multipliers, dtype=float)
+    load_multipliers = load_multipliers.reshape(load_multipliers.shape[0], -1)
+    levels, unit_loads = load_multipliers.shape
+    packed_steps, points, _ = stress_matrix.shape
+    load_steps = (packed_steps - 1)//unit_loads
+    if unit_loads == 1 or load_steps == 2:
+        findley_vec = eval_findley_load_sweep(a_cp, stress_matrix, search_grid, load_multipliers, plane_batch_size,
+                                              sampling, num_planes)
+        if return_statistics:
+            return findley_vec, np.dstack((np.ones((points, levels)), np.zeros((points, levels))))
+        return findley_vec
+
+    spacing = plane_spacing(theta.shape[0]) if sampling == 'spiral' else float(search_grid)
+    if neighbourhood is None:
+        neighbourhood = 2*spacing
+    neighbour_start, neighbours = _plane_neighbours(normals, neighbourhood)
+    unit_load_history = stress_matrix[1:].reshape(unit_loads, load_steps, points, 6)
+    a_cp = np.asarray(a_cp, dtype=float).reshape(1, points)
+    planes = theta.shape[0]
+    nodes = np.arange(points)
+
+    def pair_quantities(level_stress, pair_nodes, pair_planes):
+        # Largest normal stress, shear stress amplitude and Findley stress of (node, plane) pairs
+        max_sigma_n = np.empty(pair_nodes.shape[0])
+        max_tau_amplitude = np.empty(pair_nodes.shape[0])
+        for b in range(0, pair_nodes.shape[0], plane_batch_size*points):
+            block = slice(b, b + plane_batch_size*points)
+            block_sigma_n, block_tau_amplitude = _node_plane_quantities(level_stress[:, pair_nodes[block], :],
+                                                                        transform_rows[pair_planes[block]][:, None])
+            max_sigma_n[block] = block_sigma_n[:, 0]
+            max_tau_amplitude[block] = block_tau_amplitude[:, 0]
+        return max_sigma_n, max_tau_amplitude, max_tau_amplitude + a_cp[0, pair_nodes]*max_sigma_n
+
+    findley_vec = np.zeros((levels, 1, points, 5))
+    findley_vec[:, :, :, 4] = -np.inf
+    critical_plane = np.zeros((levels, 1, points), dtype=int)
+    evaluated_statistics = np.zeros((points, levels, 2))
+    evaluated_statistics[:, 0, 0] = 1
+
+    # All planes for the first level, together with the shear stress amplitudes and normal stress extremes of the unit
+    # loads used for the bounds
+    findley_bound = np.empty((planes, points))
+    unit_tau_amplitude = np.empty((unit_loads, planes, points))
+    unit_sigma_max = np.empty((unit_loads, planes, points))
+    unit_sigma_min = np.empty((unit_loads, planes, points))
+    level_stress = stress_matrix[0] + np.tensordot(load_multipliers[0], unit_load_history, axes=1)
+    for a in range(0, planes, plane_batch_size):
+        rows = transform_rows[a:a + plane_batch_size]
+        batch = slice(a, a + rows.shape[0])
+        max_sigma_n, max_tau_amplitude = _plane_quantities(level_stress, rows)
+        _update_critical_planes(findley_vec[0], critical_plane[0], a_cp, max_sigma_n, max_tau_amplitude, a)
+        findley_bound[batch] = max_tau_amplitude + a_cp*max_sigma_n
+        for u in range(unit_loads):
+            plane_stresses = _critical_plane_stresses(unit_load_history[u], rows)
+            _, _, unit_tau_amplitude[u, batch] = smallest_enclosing_circles(plane_stresses[:, 1], plane_stresses[:, 2])
+            unit_sigma_max[u, batch] = np.max(plane_stresses[:, 0], axis=-1)
+            unit_sigma_min[u, batch] = np.min(plane_stresses[:, 0], axis=-1)
+
+    for level in range(1, levels):
+        level_stress = stress_matrix[0] + np.tensordot(load_multipliers[level], unit_load_history, axes=1)
+        for u, change in enumerate(load_multipliers[level] - load_multipliers[level - 1]):
+            findley_bound += abs(change)*unit_tau_amplitude[u] + np.maximum(change*a_cp*unit_sigma_max[u],
+                                                                            change*a_cp*unit_sigma_min[u])
+
+        # The neighbourhood of the previous critical plane, the (node, plane) pairs of all nodes are evaluated together
+        start = neighbour_start[critical_plane[level - 1, 0]]
+        counts = neighbour_start[critical_plane[level - 1, 0] + 1] - start
+        pair_nodes = np.repeat(nodes, counts)
+        pair_planes = neighbours[np.repeat(start - np.cumsum(counts) + counts, counts) + np.arange(pair_nodes.shape[0])]
+        max_sigma_n, max_tau_amplitude, findley_stress = pair_quantities(level_stress, pair_nodes, pair_planes)
+        findley_bound[pair_planes, pair_nodes] = findley_stress
+        best = np.full(points, -np.inf)
+        np.maximum.at(best, pair_nodes, findley_stress)
+
+        # All other planes which can have a Findley stress at least as high, with a small margin for round-off
+        candidates = findley_bound >= best - 1e-9*np.abs(best)
+        candidates[pair_planes, pair_nodes] = False
+        candidate_planes, candidate_nodes = np.nonzero(candidates)
+        candidate_sigma_n, candidate_tau_amplitude, candidate_findley_stress = pair_quantities(
+            level_stress, candidate_nodes, candidate_planes)
+        findley_bound[candidate_planes, candidate_nodes] = candidate_findley_stress
+
+        # The plane with the highest Findley stress and the lowest index is the critical one, as in eval_findley
+        pair_nodes = np.concatenate([pair_nodes, candidate_nodes])
+        pair_planes = np.concatenate([pair_planes, candidate_planes])
+        findley_stress = np.concatenate([findley_stress, candidate_findley_stress])
+        order = np.lexsort((pair_planes, -findley_stress, pair_nodes))
+        best = order[np.searchsorted(pair_nodes[order], nodes)]
+        findley_vec[level, 0, :, 2] = np.concatenate([max_sigma_n, candidate_sigma_n])[best]
+        findley_vec[level, 0, :, 3] = np.concatenate([max_tau_amplitude, candidate_tau_amplitude])[best]
+        findley_vec[level, 0, :, 4] = findley_stress[best]
+        critical_plane[level, 0] = pair_planes[best]
+        evaluated_statistics[:, level, 0] = np.bincount(pair_nodes, minlength=points)/float(planes)
+        evaluated_statistics[candidate_nodes, level, 1] = 1
+
+    _critical_plane_angles(findley_vec, critical_plane, theta, phi, legacy_order=sampling == 'grid')
+    if return_statistics:
+        return findley_vec[:, 0], evaluated_statistics
+    return findley_vec[:, 0]
+
+
+def _plane_neighbours(normals, neighbourhood):
+    # The planes within the angle neighbourhood (degrees) of every plane. The neighbours of plane p are
+    # neighbours[neighbour_start[p]:neighbour_start[p + 1]] in increasing order. The neighbours are computed once per
+    # process for each plane set and neighbourhood
+    key = (normals.shape[0], normals.tobytes(), neighbourhood)
+    if key not in _plane_neighbours_cache:
+        cos_neighbourhood = np.cos(np.pi*neighbourhood/180)
+        neighbours = []
+        for a in range(0, normals.shape[0], 256):
+            for cos_angle in np.abs(np.dot(normals[a:a + 256], normals.T)):
+                neighbours.append(np.nonzero(cos_angle >= cos_neighbourhood - 1e-12)[0])
+        neighbour_start = np.cumsum([0] + [plane_neighbours.shape[0] for plane_neighbours in neighbours])
+        neighbours = np.concatenate(neighbours)
+        for array in [neighbour_start, neighbours]:
+            array.setflags(write=False)
+        _plane_neighbours_cache[key] = neighbour_start, neighbours
+    return _plane_neighbours_cache[key]
+
+
+def eval_critical_plane_criteria(a_cp, stress_matrix, search_grid, criteria, plane_batch_size=64, sampling='grid',
+                                 num_planes=None, dtype=np.float64):
+    # Evaluates the critical plane criteria, see critical_plane_criteria, from one sweep over the planes. a_cp has the
+    # shape (criteria, nodes) with the parameter of each criterion and the results the shape (criteria, nodes, 5) with
+    # [phi, theta, normal stress, shear stress amplitude, criterion value] for the critical plane of each criterion.
+    # dtype is the precision of the computations, see eval_findley_vectorized
+    theta, phi, _, _, transform_rows = plane_bank(search_grid, sampling, num_planes)
+    stress_matrix = np.asarray(stress_matrix, dtype=dtype)
+    transform_rows = transform_rows.astype(dtype, copy=False)
+
+    loadsteps, points, no_stress_components = stress_matrix.shape
+    a_cp = np.asarray(a_cp, dtype=dtype).reshape(len(criteria), points)
+    nodes = np.arange(points)
+    hydrostatic_stress = np.sum(stress_matrix[:, :, 0:3], axis=2).T/3
+
+    results = np.zeros((len(criteria), points, 5))
+    selection = -np.inf*np.ones((len(criteria), points))
+    critical_plane = np.zeros((len(criteria), points), dtype=int)
+    for a in range(0, theta.shape[0], plane_batch_size):
+        plane_stresses = _critical_plane_stresses(stress_matrix, transform_rows[a:a + plane_batch_size])
+        tau_center_1, tau_center_2, tau_amplitude = smallest_enclosing_circles(plane_stresses[:, 1],
+                                                                               plane_stresses[:, 2])
+        plane_data = PlaneData(sigma_n=plane_stresses[:, 0], tau_1=plane_stresses[:, 1], tau_2=plane_stresses[:, 2],
+                               tau_amplitude=tau_amplitude, tau_center_1=tau_center_1, tau_center_2=tau_center_2,
+                               hydrostatic_stress=hydrostatic_stress)
+        for i, criterion in enumerate(criteria):
+            criterion_selection = criterion.selection(plane_data, a_cp[i])
+            idx = np.argmax(criterion_selection, axis=0)
+            update = criterion_selection[idx, nodes] > selection[i]
+            selection[i, update] = criterion_selection[idx, nodes][update]
+            critical_plane[i, update] = a + idx[update]
+            results[i, update, 2] = criterion.normal_stress(plane_data)[idx, nodes][update]
+            results[i, update, 3] = tau_amplitude[idx, nodes][update]
+            results[i, update, 4] = criterion.value(plane_data, a_cp[i])[idx, nodes][update]
+
+    _critical_plane_angles(results, critical_plane, theta, phi)
+    return results
+
+
+def eval_findley_plane_map(a_cp, stress_matrix, search_grid, top_k=3, neighbourhood=None, plane_batch_size=64,
+                           sampling='grid', num_planes=None):
+    # Findley stress of every node on every plane of the plane set, shape (nodes, planes), together with the critical
+    # plane, shape (nodes,), and the top_k competing planes of each node, shape (nodes, top_k), with their Findley
+    # stresses. The competing planes are the local maxima of the Findley stress over the planes, a plane is a local
+    # maximum if no plane within the angle neighbourhood (degrees), by default 1.5 times the plane spacing, has a
+    # higher Findley stress and it is the first of equal planes. Nodes with fewer local maxima get -1 as plane and NaN
+    # as Findley stress for the missing planes. The critical plane is the same as for eval_findley_vectorized
+    theta, phi, normals, _, transform_rows = plane_bank(search_grid, sampling, num_planes)
+    spacing = plane_spacing(theta.shape[0]) if sampling == 'spiral' else float(search_grid)
+    if neighbourhood is None:
+        neighbourhood = 1.5*spacing
+    neighbour_start, neighbours = _plane_neighbours(normals, neighbourhood)
+
+    loadsteps, points, _ = stress_matrix.shape
+    a_cp = np.asarray(a_cp, dtype=float).reshape(points)
+    findley_map = np.empty((points, theta.shape[0]))
+    for a in range(0, theta.shape[0], plane_batch_size):
+        max_sigma_n, max_tau_amplitude = _plane_quantities(stress_matrix, transform_rows[a:a + plane_batch_size])
+        findley_map[:, a:a + max_sigma_n.shape[0]] = (max_tau_amplitude + a_cp*max_sigma_n).T
+    critical_plane = np.argmax(findley_map, axis=1)
+
+    # Local maxima, duplicated planes of the grid are only counted once. Equal planes can differ by round-off in the
+    # Findley stress and a small tolerance is used
+    neighbour_max = np.maximum.reduceat(findley_map[:, neighbours], neighbour_start[:-1], axis=1)
+    local_max = findley_map >= neighbour_max - 1e-9*np.max(np.abs(findley_map), axis=1, keepdims=True)
+    duplicate = np.ones(theta.shape[0], dtype=bool)
+    duplicate[_unique_plane_indices(theta, phi)] = False
+    local_max[:, duplicate] = False
+    candidates = np.where(local_max, findley_map, -np.inf)
+    top_planes = np.argsort(-candidates, axis=1, kind='mergesort')[:, :top_k]
+    top_findley = np.take_along_axis(candidates, top_planes, axis=1)
+    top_planes[np.isinf(top_findley)] = -1
+    top_findley[np.isinf(top_findley)] = np.nan
+    return findley_map, critical_plane, top_planes, top_findley
+
+
+def export_critical_planes(filename, combined_stress, a_cp, search_grid=5, top_k=3, damage_map_rows=None,
+                           chunk_size=300, sampling='grid', num_planes=None):
+    # Writes the critical planes of all rows to the compressed .npz file filename for crack path studies. The rows are
+    # evaluated in chunks of chunk_size rows with eval_findley_plane_map and only the Findley stresses of the rows in
+    # damage_map_rows are kept for all planes. The file holds
+    #   normal                  Unit normal of the critical plane, float32 (rows, 3), with a positive z-component
+    #   findley, sigma_n, tau_amplitude
+    #                           Findley stress, largest normal stress and shear stress amplitude on the critical
+    #                           plane, float32 (rows,)
+    #   top_planes, top_findley Indices and Findley stresses of the top_k competing planes, see eval_findley_plane_map,
+    #                           uint16, or uint32 for more than 65535 planes, with the largest value for missing planes,
+    #                           and float32 (rows, top_k)
+    #   plane_normals, theta, phi
+    #                           The plane set, float32 (planes, 3) and (planes,)
+    #   damage_map_rows, damage_map, damage_map_range
+    #                           If damage_map_rows is given, the Findley stress on all planes for these rows quantised
+    #                           to uint16 (rows, planes) between the limits in damage_map_range, float32 (rows, 2), see
+    #                           dequantise_damage_map
+    # a_cp can be a FindleyParameterModel, its parameters are then computed for each chunk
+    theta, phi, normals, _, transform_rows = plane_bank(search_grid, sampling, num_planes)
+    load_steps, rows, _ = combined_stress.shape
+    plane_dtype = np.uint16 if theta.shape[0] < np.iinfo(np.uint16).max else np.uint32
+    damage_map_rows = np.array([] if damage_map_rows is None else damage_map_rows, dtype=int)
+
+    data = {'normal': np.empty((rows, 3), dtype=np.float32),
+            'findley': np.empty(rows, dtype=np.float32),
+            'sigma_n': np.empty(rows, dtype=np.float32),
+            'tau_amplitude': np.empty(rows, dtype=np.float32),
+            'top_planes': np.empty((rows, top_k), dtype=plane_dtype),
+            'top_findley': np.empty((rows, top_k), dtype=np.float32),
+            'plane_normals': normals.astype(np.float32),
+            'theta': theta.astype(np.float32),
+            'phi': phi.astype(np.float32),
+            'damage_map_rows': damage_map_rows,
+            'damage_map': np.empty((damage_map_rows.shape[0], theta.shape[0]), dtype=np.uint16),
+            'damage_map_range': np.empty((damage_map_rows.shape[0], 2), dtype=np.float32)}
+    for a in range(0, rows, chunk_size):
+        b = min(a + chunk_size, rows)
+        stress = np.asarray(combined_stress[:, a:b, :], dtype=float)
+        findley_map, critical_plane, top_planes, top_findley = eval_findley_plane_map(
+            findley_parameters(findley_parameter_rows(a_cp, slice(a, b))), stress, search_grid, top_k,
+            sampling=sampling, num_planes=num_planes)
+        chunk_rows = np.arange(b - a)
+        max_sigma_n, max_tau_amplitude = _node_plane_quantities(stress, transform_rows[critical_plane][:, None])
+        data['normal'][a:b] = normals[critical_plane]
+        data['findley'][a:b] = findley_map[chunk_rows, critical_plane]
+        data['sigma_n'][a:b] = max_sigma_n[:, 0]
+        data['tau_amplitude'][a:b] = max_tau_amplitude[:, 0]
+        top_planes[top_planes < 0] = np.iinfo(plane_dtype).max
+        data['top_planes'][a:b] = top_planes
+        data['top_findley'][a:b] = top_findley
+
+        in_chunk = np.nonzero(np.logical_and(damage_map_rows >= a, damage_map_rows < b))[0]
+        if in_chunk.shape[0] > 0:
+            damage_map = findley_map[damage_map_rows[in_chunk] - a]
+            lower = np.min(damage_map, axis=1)
+            upper = np.max(damage_map, axis=1)
+            scale = np.where(upper > lower, upper - lower, 1.)
+            data['damage_map'][in_chunk] = np.round((damage_map - lower[:, None])/scale[:, None]*65535)
+            data['damage_map_range'][in_chunk, 0] = lower
+            data['damage_map_range'][in_chunk, 1] = upper
+    np.savez_compressed(filename, **data)
+
+
+def dequantise_damage_map(damage_map, damage_map_range):
+    # Findley stresses, shape (rows, planes), from the quantised damage map written by export_critical_planes
+    lower = damage_map_range[:, 0:1].astype(float)
+    upper = damage_map_range[:, 1:2].astype(float)
+    return lower + damage_map.astype(float)/65535*(upper - lower)
+
+
+def _node_plane_quantities(stress_matrix, transform_rows):
+    # Largest normal stress and shear stress amplitude on individual planes for every node, transform_rows has the shape
+    # (nodes, planes, 3, 6) and the results the shape (nodes, planes)
+    if stress_matrix.shape[0] == 2:
+        sigma_n = np.einsum('npc,lnc->npl', transform_rows[:, :, 0, :], stress_matrix)
+        delta_tau = np.einsum('npjc,nc->npj', transform_rows[:, :, 1:, :], stress_matrix[1] - stress_matrix[0])
+        return np.max(sigma_n, axis=-1), np.sqrt(delta_tau[:, :, 0]**2 + delta_tau[:, :, 1]**2)/2
+
+    plane_stresses = np.einsum('npjc,lnc->npjl', transform_rows, stress_matrix)
+    _, _, max_tau_amplitude = smallest_enclosing_circles(plane_stresses[:, :, 1], plane_stresses[:, :, 2])
+    return np.max(plane_stresses[:, :, 0], axis=-1), max_tau_amplitude
+
+
+def eval_findley_adaptive(a_cp, stress_matrix, search_grid, tolerance=0.5, candidates=3, max_iterations=100,
+                          return_statistics=False, sampling='grid', num_planes=None):
+    # Adaptive critical plane search. The planes given by search_grid, sampling and num_planes, see plane_set, are
+    # scanned and the best candidates planes for each node are refined with a pattern search. The eight planes at +-step
+    # in theta and phi around the current plane are evaluated, the search moves to the best of them if it is better than
+    # the current plane and otherwise the step is halved. The refinement stops when the step is smaller than tolerance
+    # (degrees).
+    #
+    # The result array is [phi, theta, max_sigma_n, max_tau_amplitude, F] with the angles of the critical plane mapped
+    # to theta in [0, 180) and phi in [-90, 90], see plane_angles.
+    # If return_statistics is True an array with the columns [number of evaluated planes, refinement iterations,
+    # final step, increase of F compared to the coarse scan] is also returned for each node
+    loadsteps, points, no_stress_components = stress_matrix.shape
+    nodes = np.arange(points)
+
+    # Coarse scan
+    theta, phi, _, _, transform_rows = plane_bank(search_grid, sampling, num_planes)
+    max_sigma_n, max_tau_amplitude = _plane_quantities(stress_matrix, transform_rows)
+    findley_stress = max_tau_amplitude + a_cp*max_sigma_n
+
+    candidates = min(candidates, theta.shape[0])
+    idx = np.argsort(-findley_stress, axis=0, kind='mergesort')[:candidates].T      # shape (nodes, candidates)
+    theta_c = theta[idx]
+    phi_c = phi[idx]
+    sigma_c = max_sigma_n[idx, nodes[:, None]]
+    tau_c = max_tau_amplitude[idx, nodes[:, None]]
+    f_c = findley_stress[idx, nodes[:, None]]
+    f_coarse = np.max(f_c, axis=1)
+    if sampling == 'spiral':
+        step = np.zeros(f_c.shape) + plane_spacing(theta.shape[0])/2
+    else:
+        step = np.zeros(f_c.shape) + search_grid/2.
+
+    # Pattern search
+    d_theta = np.array([-1., -1., -1., 0., 0., 1., 1., 1.])
+    d_phi = np.array([-1., 0., 1., -1., 1., -1., 0., 1.])
+    evaluated_planes = np.zeros(points) + theta.shape[0]
+    iterations = np.zeros(points)
+    for _ in range(max_iterations):
+        node_idx, cand_idx = np.nonzero(step >= tolerance)
+        if node_idx.shape[0] == 0:
+            break
+        h = step[node_idx, cand_idx][:, None]
+        theta_n = theta_c[node_idx, cand_idx][:, None] + h*d_theta
+        phi_n = phi_c[node_idx, cand_idx][:, None] + h*d_phi
+        rows = get_transform_matrices(theta_n.flatten(), phi_n.flatten())[:, [0, 3, 4], :]
+        sigma_n, tau_n = _node_plane_quantities(stress_matrix[:, node_idx, :],
+                                                rows.reshape(node_idx.shape[0], d_theta.shape[0], 3, 6))
+        f_n = tau_n + np.asarray(a_cp)[node_idx, None]*sigma_n
+
+        best = np.argmax(f_n, axis=1)
+        rng = np.arange(node_idx.shape[0])
+        improved = f_n[rng, best] > f_c[node_idx, cand_idx]
+        i, c, b = node_idx[improved], cand_idx[improved], best[improved]
+        theta_c[i, c] = theta_n[improved, b]
+        phi_c[i, c] = phi_n[improved, b]
+        sigma_c[i, c] = sigma_n[improved, b]
+        tau_c[i, c] = tau_n[improved, b]
+        f_c[i, c] = f_n[improved, b]
+        step[node_idx[~improved], cand_idx[~improved]] /= 2
+
+        np.add.at(evaluated_planes, node_idx, d_theta.shape[0])
+        iterations[np.unique(node_idx)] += 1
+
+    best = np.argmax(f_c, axis=1)
+    critical_theta, critical_phi = plane_angles(plane_normals(theta_c[nodes, best], phi_c[nodes, best]))
+    findley_vec = np.zeros((points, 5))
+    findley_vec[:, 0] = critical_phi
+    findley_vec[:, 1] = critical_theta
+    findley_vec[:, 2] = sigma_c[nodes, best]
+    findley_vec[:, 3] = tau_c[nodes, best]
+    findley_vec[:, 4] = f_c[nodes, best]
+    if return_statistics:
+        return findley_vec, np.vstack((evaluated_planes, iterations, np.max(step, axis=1),
+                                       findley_vec[:, 4] - f_coarse)).T
+    return findley_vec
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+
+def share_array(array, filename, dtype=None):
+    # Returns a SharedArray describing array. An array which already is a memory mapped file is described as it is,
+    # otherwise the array is written to filename, converted to dtype if it is given. The conversion is made by the
+    # buffered assignment to the file, the array is not copied as a whole
+    if isinstance(array, np.memmap) and isinstance(array.base, mmap.mmap) and array.flags['C_CONTIGUOUS']:
+        return SharedArray(filename=array.filename, dtype=array.dtype.str, shape=array.shape, offset=array.offset)
+    array = np.asarray(array)
+    shared = np.memmap(filename, dtype=dtype or array.dtype, mode='w+', shape=array.shape)
+    shared[...] = array
+    shared.flush()
+    return SharedArray(filename=filename, dtype=shared.dtype.str, shape=shared.shape, offset=0)
+
+
+def _read_shared_rows(shared, rows, dtype=None):
+    # Copy of the rows, a slice of the last axis or of the second axis for the stress history, of a SharedArray,
+    # converted to dtype if it is given. The file is mapped for each job and unmapped when the copy is made, a worker
+    # in a reused pool would otherwise keep the files of earlier runs mapped after they are removed and their disk
+    # space would not be freed
+    array = np.memmap(shared.filename, dtype=np.dtype(shared.dtype), mode='r', shape=tuple(shared.shape),
+                      offset=shared.offset)
+    if len(shared.shape) == 3:
+        rows_data = np.array(array[:, rows, :], dtype=dtype)
+    else:
+        rows_data = np.array(array[..., rows], dtype=dtype)
+    del array
+    return rows_data
+
+
 def findley_worker(job_arguments):
     # Expand recieved arguments
-    # a_cp,stress_matrix=job_arguments
+    # a_cp, stress_matrix, search_grid, engine, engine_options, rows = job_arguments
+    # a_cp and stress_matrix are either the data for the rows or SharedArrays with the data of all rows
+    # Returns the results of the engine and the time used
 
     # Create results array
 
     try:
-        return eval_findley(job_arguments[0], job_arguments[1], job_arguments[2])
+        a_cp, stress_matrix = job_arguments[0], job_arguments[1]
+        a, b = job_arguments[5]
+        if isinstance(a_cp, SharedArray):
+            a_cp = _read_shared_rows(a_cp, slice(a, b))
+        if isinstance(a_cp, FindleyParameterModel):
+            if isinstance(a_cp.steel_data[0], SharedArray):
+                a_cp = a_cp._replace(steel_data=type(a_cp.steel_data)(*[_read_shared_rows(field, slice(a, b))
+                                                                        for field in a_cp.steel_data]))
+            a_cp = findley_parameters(a_cp)
+        if isinstance(stress_matrix, SharedArray):
+            stress_matrix = _read_shared_rows(stress_matrix, slice(a, b), job_arguments[4].get('dtype'))
+        start_time = time.time()
+        job_results = _findley_engines[job_arguments[3]](np.asarray(a_cp), stress_matrix, job_arguments[2],
+                                                         **job_arguments[4])
+        return job_results, time.time() - start_time
 
     except KeyboardInterrupt:
         raise KeyboardInterrupt
@@ -254,3 +1595,19 @@ def findley_worker(job_arguments):
         print(sys.exc_info()[0])  # - Exit type:', sys.exc_info()[0]
         print(sys.exc_info()[1])  # - Exit type:', sys.exc_info()[0]
         raise
+
+
+_findley_engines = {'loop': eval_findley,
+                    'vectorized': eval_findley_vectorized,
+                    'adaptive': eval_findley_adaptive,
+                    'load_sweep': eval_findley_load_sweep,
+                    'continuation': eval_findley_continuation,
+                    'criteria': eval_critical_plane_criteria}
+
+_engines_with_statistics = ['adaptive', 'continuation']
+_engines_with_parameter_fields = ['vectorized', 'load_sweep', 'criteria']
+_engines_with_single_precision = ['vectorized', 'load_sweep', 'criteria']
+
+# evaluate_findley splits the planes between the workers when there are fewer rows than this factor times the number
+# of workers
+_plane_parallel_factor = 4
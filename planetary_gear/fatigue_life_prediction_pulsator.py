@@ -43,9 +43,7 @@ def calculate_life(load, cd, size_factor):
                           nodal_positions=position.reshape(n_vol / 8, 8, 3))
 
     wl_evaluator = WeakestLinkEvaluator(data_volume=fem_volume, data_area=None, size_factor=size_factor)
-    lives = 0*pf_levels
-    for it, pf in enumerate(pf_levels):
-        lives[it] = wl_evaluator.calculate_life_time(pf=pf, haiback=haiback)
+    lives = wl_evaluator.calculate_life_times(pf_levels, haiback=haiback)
     pf = wl_evaluator.calculate_pf()
     return pf, lives
 
@@ -4,7 +4,11 @@ import sys
 import pickle
 import numpy as np
 
+from materials.gear_materials import FindleyParameterA800
+from materials.gear_materials import SteelData
+
 from multiaxial_fatigue.findley_evaluation_functions import evaluate_findley
+from multiaxial_fatigue.findley_evaluation_functions import FindleyParameterModel
 
 mesh = '1x'
 cd = float(sys.argv[1])
@@ -42,34 +46,44 @@ print '=========================================================================
 
 
 loads = np.arange(30, 41, 1.)
+a800_values = np.array([0.6, 0.7, 0.8, 0.9, 1.0, 1.1, 1.2, 1.3, 1.4, 1.5, 1.6])
 n = dante_data.values()[0].shape[0]
 stress_history = np.zeros((2, n, 6))
-for a800 in np.array([0.6, 0.7, 0.8, 0.9, 1.0, 1.1, 1.2, 1.3, 1.4, 1.5, 1.6]):
-    for load in loads:
-        print '========================================================================================================'
-        print "Analyzing Pamp =", load, 'kN'
-        print '========================================================================================================'
-        fem_loads = np.array(mechanical_data.values()[0].keys())
-        f1, f2 = tuple(np.sort(fem_loads[np.argsort(np.abs(fem_loads - load))][0:2]))
 
-        min_stresses = mechanical_data['min_load']
-        max_stresses = mechanical_data['max_load']
-        print "Max mechanical stress at interesting point"
-        print "Pamp = 30 kN :", max_stresses[30][monitor_node_idx]
-        print "Pamp = 35 kN :", max_stresses[35][monitor_node_idx]
-        print "Pamp = 40 kN :", max_stresses[40][monitor_node_idx]
+# Findley parameter fields for all a800 values, computed by the workers and evaluated in the same plane sweep
+findley_k = FindleyParameterModel(material=FindleyParameterA800(a800_values), steel_data=SteelData(HV=dante_data['HV']))
 
-        min_stress = min_stresses[f1] + (min_stresses[f2] - min_stresses[f1])/(f2 - f1)*(load-f1)
-        max_stress = max_stresses[f1] + (max_stresses[f2] - max_stresses[f1])/(f2 - f1)*(load-f1)
+for load in loads:
+    print '========================================================================================================'
+    print "Analyzing Pamp =", load, 'kN'
+    print '========================================================================================================'
+    fem_loads = np.array(mechanical_data.values()[0].keys())
+    f1, f2 = tuple(np.sort(fem_loads[np.argsort(np.abs(fem_loads - load))][0:2]))
 
-        stress_history[0, :, :] = min_stress + dante_data['S']
-        stress_history[1, :, :] = max_stress + dante_data['S']
+    min_stresses = mechanical_data['min_load']
+    max_stresses = mechanical_data['max_load']
+    print "Max mechanical stress at interesting point"
+    print "Pamp = 30 kN :", max_stresses[30][monitor_node_idx]
+    print "Pamp = 35 kN :", max_stresses[35][monitor_node_idx]
+    print "Pamp = 40 kN :", max_stresses[40][monitor_node_idx]
 
-        print '========================================================================================================'
-        print 'The minimum stress at interesting point is ', stress_history[0, monitor_node_idx, :]
-        print 'The maximum stress at interesting point is ', stress_history[1, monitor_node_idx, :]
-        print '========================================================================================================'
+    min_stress = min_stresses[f1] + (min_stresses[f2] - min_stresses[f1])/(f2 - f1)*(load-f1)
+    max_stress = max_stresses[f1] + (max_stresses[f2] - max_stresses[f1])/(f2 - f1)*(load-f1)
 
+    stress_history[0, :, :] = min_stress + dante_data['S']
+    stress_history[1, :, :] = max_stress + dante_data['S']
+
+    print '========================================================================================================'
+    print 'The minimum stress at interesting point is ', stress_history[0, monitor_node_idx, :]
+    print 'The maximum stress at interesting point is ', stress_history[1, monitor_node_idx, :]
+    print '========================================================================================================'
+
+    findley_data = evaluate_findley(combined_stress=stress_history,
+                                    a_cp=findley_k,
+                                    worker_run_out_time=8000,
+                                    num_workers=8, chunk_size=300, search_grid=10, engine='vectorized')
+
+    for a800, a800_findley_data in zip(a800_values, findley_data):
         findley_pickle_directory = os.path.expanduser('~/scania_gear_analysis/pickles/tooth_root_fatigue_analysis/'
                                                       'mesh_' + mesh + '/findley_tempering_2h_180C_a800=' +
                                                       str(a800).replace('.', '_') + '/pulsator/')
@@ -80,17 +94,8 @@ for a800 in np.array([0.6, 0.7, 0.8, 0.9, 1.0, 1.1, 1.2, 1.3, 1.4, 1.5, 1.6]):
         print '========================================================================================================'
         print "Analyzing a800 =", a800
         print '========================================================================================================'
-        HV = dante_data['HV']
-        b = (a800 - 0.3) / (800 - 450)
-        a = a800 - b * 800
-
-        findley_k = a + b * HV
-        findley_data = evaluate_findley(combined_stress=stress_history,
-                                        a_cp=findley_k,
-                                        worker_run_out_time=8000,
-                                        num_workers=8, chunk_size=300, search_grid=10)
 
-        findley_stress = findley_data[:, 2]
+        findley_stress = a800_findley_data[:, 2]
         print "The Findley stress at interesting point is ", findley_stress[monitor_node_idx], 'MPa'
         findley_pickle_name = 'findley_CD=' + str(cd).replace('.', '_') + '_Pamp=' + str(load).replace('.', '_') + \
                               'kN.pkl'
@@ -5,7 +5,8 @@ import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib
 
-from weakest_link.integration_methods import gauss_integration_3d
+from weakest_link.integration_methods import gauss_integration_weights_3d
+from weakest_link.stressed_volume import StressedVolumeIndex
 
 matplotlib.style.use('classic')
 plt.rc('text', usetex=True)
@@ -22,6 +23,9 @@ with open(pickle_directory + 'pulsator_stresses_all_elements.pkl') as stress_pic
     stress_data = pickle.load(stress_pickle)
 
 load_levels = np.array(sorted(stress_data['max_load'].keys()))
+positions = stress_data['pos']
+positions = positions.reshape(positions.shape[0]/8, 8, 3)
+weights = gauss_integration_weights_3d(positions)
 max_stress = 0*load_levels
 for j, force in enumerate(load_levels):
     s = stress_data['max_load'][force]*(1 - 1/(1 + (1-0.1)/(1+0.1)))
@@ -43,14 +47,7 @@ for j, force in enumerate(load_levels):
     s1 = q + 2*p*np.cos(phi)
     max_stress[j] = np.max(s1)
     stress_levels = np.linspace(0, np.max(s1, 0), 100)
-    n = len(s1)
-    positions = stress_data['pos']
-    positions = positions.reshape(n/8, 8, 3)
-    v = 0*stress_levels
-    for i, s_th in enumerate(stress_levels):
-        s = 0*s1
-        s[s1 > s_th] = 1.
-        v[i] = gauss_integration_3d(s.reshape(n/8, 8), positions)
+    v = StressedVolumeIndex(s1, weights).volume_above(stress_levels)
 
     plt.figure(0)
     plt.plot(stress_levels/stress_levels[-1]*100, v*4, label='$P_{amp}$ = ' + str(int(force)) + ' kN', lw=2)
@@ -1,11 +1,12 @@
+from FEMfunctions import Element4
 from FEMfunctions import Element8
 from FEMfunctions import det3
 import numpy as np
 
 
-def gauss_integration_3d(function_values, xyz):
+def _gauss_point_tables():
+    # Shape functions, shape (8, 8), and their derivatives, shape (8, 3, 8), of Element8 at the 2x2x2 Gauss points
     e = Element8()
-    n = xyz.shape[0]
     gp = np.array([-1., 1.]) / np.sqrt(3.)
 
     n_vec = np.array([e.N(gp[0], gp[0], gp[0]), e.N(gp[0], gp[0], gp[1]),
@@ -17,13 +18,87 @@ def gauss_integration_3d(function_values, xyz):
                       e.d(gp[0], gp[1], gp[0]), e.d(gp[0], gp[1], gp[1]),
                       e.d(gp[1], gp[0], gp[0]), e.d(gp[1], gp[0], gp[1]),
                       e.d(gp[1], gp[1], gp[0]), e.d(gp[1], gp[1], gp[1])])
+    return n_vec, d_vec
+
+
+_n_vec, _d_vec = _gauss_point_tables()
+
+
+def _face_gauss_point_tables():
+    # Shape functions, shape (4, 4), and their derivatives, shape (4, 2, 4), of Element4 at the 2x2 Gauss points
+    e = Element4()
+    gp = np.array([-1., 1.]) / np.sqrt(3.)
+    n_vec = np.array([e.N(gp[0], gp[0]), e.N(gp[0], gp[1]), e.N(gp[1], gp[0]), e.N(gp[1], gp[1])])
+    d_vec = np.array([e.d(gp[0], gp[0]), e.d(gp[0], gp[1]), e.d(gp[1], gp[0]), e.d(gp[1], gp[1])])
+    return n_vec, d_vec
+
+
+_face_n_vec, _face_d_vec = _face_gauss_point_tables()
 
-    integral = np.zeros((n, 8))
+# Local nodes of the six faces of Element8, ordered counter clockwise seen from outside the element
+element8_faces = np.array([[0, 3, 2, 1],
+                           [4, 5, 6, 7],
+                           [0, 1, 5, 4],
+                           [1, 2, 6, 5],
+                           [2, 3, 7, 6],
+                           [3, 0, 4, 7]])
 
-    # Interpolating values to each gauss point
+
+def gauss_integration_weights_3d(xyz):
+    # Integration weights of the nodal values of Element8 elements with the nodal positions xyz, shape (elements, 8, 3).
+    # The weight of a node is the sum over the Gauss points of its shape function times the Jacobian determinant and the
+    # integral of the nodal values f, shape (elements, 8), is np.sum(f*weights)
+    weights = np.zeros((xyz.shape[0], 8))
     for i in range(8):
-        integral[:, i] = np.dot(function_values[:, :], n_vec[i, :])*det3(np.matmul(d_vec[i], xyz))
-    return np.sum(np.sum(integral, 1))
+        weights += np.outer(det3(np.matmul(_d_vec[i], xyz)), _n_vec[i, :])
+    return weights
+
+
+def gauss_integration_3d(function_values, xyz):
+    return np.sum(function_values*gauss_integration_weights_3d(xyz))
+
+
+def gauss_integration_weights_2d(xyz):
+    # Integration weights of the nodal values of Element4 faces in space with the nodal positions xyz,
+    # shape (faces, 4, 3). The weight of a node is the sum over the Gauss points of its shape function times the area
+    # scale factor |dx/dxi x dx/deta| and the integral of the nodal values f, shape (faces, 4), is np.sum(f*weights)
+    weights = np.zeros((xyz.shape[0], 4))
+    for i in range(4):
+        jacobian = np.matmul(_face_d_vec[i], xyz)
+        area_scale = np.sqrt(np.sum(np.cross(jacobian[:, 0, :], jacobian[:, 1, :])**2, axis=1))
+        weights += np.outer(area_scale, _face_n_vec[i, :])
+    return weights
+
+
+def gauss_integration_2d(function_values, xyz):
+    return np.sum(function_values*gauss_integration_weights_2d(xyz))
+
+
+def exposed_faces(xyz, decimals=6, exclude_planes=None, exclude=None):
+    # Faces of the Element8 elements with the nodal positions xyz, shape (elements, 8, 3), that are not shared with
+    # another element. The faces are matched by their corner positions rounded to decimals. Returns the element and
+    # the local face, a row in element8_faces, of each exposed face.
+    # Faces on cut or symmetry planes of a model are exposed as well and are removed with
+    #   exclude_planes  A list of planes as (point, normal), faces with all corners within 10**-decimals of one of the
+    #                   planes are removed
+    #   exclude         A function of the face centroids, shape (faces, 3), returning True for the faces to remove
+    corners = np.round(xyz[:, element8_faces, :], decimals).reshape(-1, 4, 3)
+    # Corners sorted lexicographically to get the same key for the face seen from both elements
+    order = np.lexsort((corners[:, :, 2], corners[:, :, 1], corners[:, :, 0]), axis=1)
+    keys = corners[np.arange(corners.shape[0])[:, None], order].reshape(-1, 12)
+    _, inverse, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+    exposed = np.nonzero(counts[inverse.ravel()] == 1)[0]
+
+    face_corners = xyz[:, element8_faces, :].reshape(-1, 4, 3)[exposed]
+    keep = np.ones(exposed.shape[0], dtype=bool)
+    for point, normal in exclude_planes or []:
+        normal = np.asarray(normal, dtype=float)/np.linalg.norm(normal)
+        distance = np.abs(np.dot(face_corners - np.asarray(point, dtype=float), normal))
+        keep &= np.any(distance > 10.**-decimals, axis=1)
+    if exclude is not None:
+        keep &= ~np.asarray(exclude(np.mean(face_corners, axis=1)), dtype=bool)
+    exposed = exposed[keep]
+    return exposed // 6, exposed % 6
 
 
 def axi_symmetric_cylinder(function_values, r, h):
@@ -0,0 +1,74 @@
+import itertools
+
+import numpy as np
+
+from weakest_link.hazard_functions import weibull
+from weakest_link.weakest_link_evaluator import FEM_data
+from weakest_link.weakest_link_evaluator import WeakestLinkEvaluator
+
+from materials.gear_materials import SS2506
+
+
+class StressedVolumeIndex:
+    # Integration point values sorted by decreasing stress together with their integration weights, for instance the
+    # nodal values of the volume data of WeakestLinkEvaluator and gauss_integration_weights_3d. The sorting is done
+    # once, after that the volume above any stress level is a cumulative sum lookup and the weakest link integral can
+    # be evaluated over the most stressed points only.
+    #
+    # The weights must be non-negative, which they are for the nodal weights of undistorted Element8 elements. The
+    # steel data of the points are only needed for the weakest link integral
+    def __init__(self, stress, weights, steel_data=None):
+        stress = np.ravel(stress)
+        self.order = np.argsort(-stress, kind='mergesort')
+        self.stress = stress[self.order]
+        self.weights = np.ravel(weights)[self.order]
+        # cumulative_volume[k] is the volume of the k most stressed points
+        self.cumulative_volume = np.concatenate([[0.], np.cumsum(self.weights)])
+        self.steel_data = None
+        if steel_data is not None:
+            self.steel_data = type(steel_data)(*[np.ravel(field)[self.order] for field in steel_data])
+            # Smallest and largest value of each field among the points from k on, used for the remainder bound
+            self._tail_min = [np.minimum.accumulate(field[::-1])[::-1] for field in self.steel_data]
+            self._tail_max = [np.maximum.accumulate(field[::-1])[::-1] for field in self.steel_data]
+
+    def volume_above(self, thresholds):
+        # Volume where the stress is larger than each of the thresholds, same shape as thresholds
+        points = np.searchsorted(-self.stress, -np.asarray(thresholds, dtype=float), side='left')
+        return self.cumulative_volume[points]
+
+    def points_above(self, threshold):
+        # Number of points with a stress larger than threshold, they are the first points of the index
+        return int(np.searchsorted(-self.stress, -threshold, side='left'))
+
+    def integrate_top(self, k, cycles=None, hazard_function=weibull, material=SS2506, haiback=False):
+        # Weakest link integral of the hazard over the k most stressed points and a bound on the integral over the
+        # remaining points. The bound is the hazard at the largest remaining stress, evaluated at the corners of the
+        # range of the steel data of the remaining points, times their volume. It holds for hazards increasing with
+        # the stress and monotone in each steel data field over that range
+        if self.steel_data is None:
+            raise ValueError("The weakest link integral needs the steel data, the index was created without them")
+        k = min(k, self.stress.shape[0])
+        steel_data = type(self.steel_data)(*[field[:k] for field in self.steel_data])
+        # The hazard functions modify the stress in place
+        f = WeakestLinkEvaluator._hazard(FEM_data(stress=np.copy(self.stress[:k]), steel_data=steel_data,
+                                                  nodal_positions=None), cycles, hazard_function, material, haiback)
+        integral = np.sum(f*self.weights[:k])
+        if k == self.stress.shape[0]:
+            return integral, 0.
+
+        corners = np.array(list(itertools.product(*[[field_min[k], field_max[k]] for field_min, field_max
+                                                    in zip(self._tail_min, self._tail_max)]))).T
+        corner_data = FEM_data(stress=self.stress[k] + 0*corners[0], steel_data=type(self.steel_data)(*corners),
+                               nodal_positions=None)
+        f_corners = WeakestLinkEvaluator._hazard(corner_data, cycles, hazard_function, material, haiback)
+        remainder = np.max(f_corners)*(self.cumulative_volume[-1] - self.cumulative_volume[k])
+        return integral, remainder
+
+    def calculate_pf_top(self, k, cycles=None, hazard_function=weibull, material=SS2506, haiback=False,
+                         size_factor=1):
+        # pf from the k most stressed points, a lower bound of the pf of all points, and the upper bound including the
+        # remainder bound of integrate_top, same size factor as WeakestLinkEvaluator
+        integral, remainder = self.integrate_top(k, cycles, hazard_function, material, haiback)
+        pf = 1 - np.exp(-integral*size_factor)
+        pf_upper = 1 - np.exp(-(integral + remainder)*size_factor)
+        return pf, pf_upper
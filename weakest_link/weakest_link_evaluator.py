@@ -2,36 +2,93 @@ from collections import namedtuple
 
 import numpy as np
 
-from weakest_link.integration_methods import gauss_integration_3d
+from weakest_link.integration_methods import element8_faces
+from weakest_link.integration_methods import exposed_faces
+from weakest_link.integration_methods import gauss_integration_weights_2d
+from weakest_link.integration_methods import gauss_integration_weights_3d
 from weakest_link.hazard_functions import weibull
 
 from materials.gear_materials import SS2506
+from materials.gear_materials import SS2506MaterialTemplate
 
 FEM_data = namedtuple('FEM_data', ['stress', 'steel_data', 'nodal_positions'])
 
+_batch_points = 2**18
+
 
 class WeakestLinkEvaluator:
-    def __init__(self, data_volume, data_area, size_factor=1):
+    # data_area holds the surface faces, stress and steel data of shape (faces, 4) and nodal positions of shape
+    # (faces, 4, 3), see surface_data. The surface term is evaluated with area_material, which holds the Weibull
+    # parameters for surface initiated failure per unit area and is required with data_area
+    def __init__(self, data_volume, data_area, size_factor=1, area_material=None):
+        if data_area is not None and area_material is None:
+            raise ValueError("An area_material with the Weibull parameters per unit area is needed for data_area")
         self.volume_data = data_volume
         self.area_data = data_area
         self.size_factor = size_factor
+        self.area_material = area_material
+        # The integration weights only depend on the geometry and are computed once
+        self.volume_weights = gauss_integration_weights_3d(self.volume_data.nodal_positions)
+        if self.area_data is not None:
+            self.area_weights = gauss_integration_weights_2d(self.area_data.nodal_positions)
 
-    def _calculate_pf_volume(self, cycles, hazard_function, material, haiback):
+    @staticmethod
+    def _hazard(data, cycles, hazard_function, material, haiback):
         if cycles and haiback:
-            f = hazard_function.haiback(self.volume_data.stress, cycles, self.volume_data.steel_data, material)
+            return hazard_function.haiback(data.stress, cycles, data.steel_data, material)
         elif cycles:
-            f = hazard_function.fatigue_life(self.volume_data.stress, cycles, self.volume_data.steel_data, material)
-        else:
-            f = hazard_function.fatigue_limit(self.volume_data.stress, self.volume_data.steel_data, material)
-        integral = gauss_integration_3d(f, self.volume_data.nodal_positions)
+            return hazard_function.fatigue_life(data.stress, cycles, data.steel_data, material)
+        return hazard_function.fatigue_limit(data.stress, data.steel_data, material)
+
+    @staticmethod
+    def _integrate(f, weights):
+        # Integral over the points, the leading axes of f that weights does not have are the parameter sets of
+        # calculate_pf_batch
+        if f.ndim == weights.ndim:
+            return np.sum(f*weights)
+        return np.sum(f*weights, axis=(-2, -1))
+
+    def _pf_from_integral(self, integral):
         pf_subvol = (1-np.exp(-integral))
         return 1 - (1-pf_subvol)**self.size_factor
 
+    def _calculate_pf_volume(self, cycles, hazard_function, material, haiback):
+        f = self._hazard(self.volume_data, cycles, hazard_function, material, haiback)
+        integral = self._integrate(f, self.volume_weights)
+        return self._pf_from_integral(integral)
+
+    def _calculate_pf_area(self, cycles, hazard_function, haiback):
+        f = self._hazard(self.area_data, cycles, hazard_function, self.area_material, haiback)
+        integral = self._integrate(f, self.area_weights)
+        return self._pf_from_integral(integral)
+
     def calculate_pf(self, cycles=None, hazard_function=weibull, material=SS2506, haiback=False):
         pf_vol = self._calculate_pf_volume(cycles, hazard_function, material, haiback)
         pf_area = 0
+        if self.area_data is not None:
+            pf_area = self._calculate_pf_area(cycles, hazard_function, haiback)
         return 1-(1-pf_vol)*(1-pf_area)
 
+    def calculate_pf_batch(self, parameters, cycles=None, hazard_function=weibull, haiback=False,
+                           material_template=SS2506MaterialTemplate, batch_size=None):
+        # pf for each row (swa, swb, mb) of parameters, shape (sets, 3), with the material
+        # material_template(swa, swb, mb). The parameters are given the shape (sets, 1, 1) and broadcast against the
+        # stored stress and steel data, batch_size sets at a time, instead of creating a material and evaluating pf for
+        # each set. The surface term is evaluated with area_material. Returns pf with shape (sets,)
+        #
+        # By default the batches hold about _batch_points points, larger batches make the temporary arrays of the
+        # hazard function fall out of the cache without reducing the work per set
+        parameters = np.atleast_2d(np.asarray(parameters, dtype=float))
+        if batch_size is None:
+            batch_size = max(1, _batch_points // np.size(self.volume_data.stress))
+        pf = np.zeros(parameters.shape[0])
+        for start in range(0, parameters.shape[0], batch_size):
+            batch = parameters[start:start + batch_size, :, None, None]
+            material = material_template(batch[:, 0], batch[:, 1], batch[:, 2])
+            pf[start:start + batch_size] = self.calculate_pf(cycles=cycles, hazard_function=hazard_function,
+                                                             material=material, haiback=haiback)
+        return pf
+
     def calculate_life_time(self, pf, hazard_function=weibull, material=SS2506, haiback=False):
         def func(life):
             pf_life = self.calculate_pf(cycles=np.exp(life), hazard_function=hazard_function, material=material,
@@ -54,13 +111,134 @@ class WeakestLinkEvaluator:
         n1 = material.ns
 
         cycles = (n1 + n2) / 2
+        f_n1 = func(n1)
         while abs(n1 - n2) / 2 > 1E-3:
             f = func(cycles)
             if f == 0:
                 return np.exp(cycles)
-            elif func(n1) * f < 0:
+            elif f_n1 * f < 0:
                 n2 = cycles
             else:
                 n1 = cycles
+                f_n1 = f
             cycles = (n1 + n2) / 2
         return np.exp(cycles)
+
+    def calculate_life_times(self, pf_levels, hazard_function=weibull, material=SS2506, haiback=False,
+                             grid_points=None, tolerance=1e-3):
+        # Life times for an array of pf levels, see calculate_life_times
+        return calculate_life_times([self], pf_levels, hazard_function, material, haiback, grid_points, tolerance)[0]
+
+
+def calculate_life_times(evaluators, pf_levels, hazard_function=weibull, material=SS2506, haiback=False,
+                         grid_points=None, tolerance=1e-3):
+    # Life times for all pf levels and all evaluators, for instance one for each load, shape (evaluators, pf levels).
+    # Gives the same lives as WeakestLinkEvaluator.calculate_life_time within tolerance in log cycles.
+    #
+    # pf is evaluated on grid_points log cycles between the limits of calculate_life_time for each evaluator, which
+    # brackets the lives of all pf levels. The brackets are then refined together with the Illinois variant of
+    # regula falsi on log(-log(1 - pf)), which is close to linear in log cycles, and with a bisection step whenever a
+    # bracket has not been halved in three steps, which guarantees convergence. A life is accepted when the bracket
+    # half width or the estimated distance to the root is below tolerance. The pf values are cached and shared between
+    # the pf levels.
+    #
+    # grid_points defaults to the number of pf levels plus two, at most 17. A finer grid costs more evaluations than it
+    # saves for few levels, and for a single level the grid is close to the bracket of calculate_life_time
+    pf_levels = np.asarray(pf_levels, dtype=float)
+    if grid_points is None:
+        grid_points = min(pf_levels.shape[0] + 2, 17)
+    n1 = material.ns
+    n2 = np.log(1e8) if haiback else material.ne
+    log_cycles = np.linspace(n1, n2, grid_points)
+
+    caches = [{} for _ in evaluators]
+
+    def pf_value(evaluator, log_life):
+        if log_life not in caches[evaluator]:
+            pf_life = evaluators[evaluator].calculate_pf(cycles=np.exp(log_life), hazard_function=hazard_function,
+                                                         material=material, haiback=haiback)
+            if not (np.isfinite(pf_life) and pf_life >= 0):
+                pf_life = 1.
+            caches[evaluator][log_life] = pf_life
+        return caches[evaluator][log_life]
+
+    def residual(pf, target):
+        def transform(p):
+            return np.log(-np.log1p(-np.clip(p, 1e-300, 1 - 1e-15)))
+        return transform(pf) - transform(target)
+
+    lives = np.zeros((len(evaluators), pf_levels.shape[0]))
+    # Bracketing on the common grid, without a sign change calculate_life_time ends at the upper limit
+    pf_grid = np.array([[pf_value(e, x) for x in log_cycles] for e in range(len(evaluators))])
+    f_grid = residual(pf_grid[:, None, :], pf_levels[None, :, None])
+    sign_change = f_grid[:, :, 1:]*f_grid[:, :, :1] <= 0
+    bracketed = np.any(sign_change, axis=2)
+    k = np.argmax(sign_change, axis=2)
+    lives[~bracketed] = n2
+    if not haiback:
+        # Levels above the pf at the fatigue limit never fail, as in calculate_life_time
+        pf_limit = np.array([evaluator.calculate_pf(cycles=None, hazard_function=hazard_function, material=material)
+                             for evaluator in evaluators])
+        above_limit = pf_levels[None, :] > pf_limit[:, None]
+    else:
+        above_limit = np.zeros(lives.shape, dtype=bool)
+
+    e_idx, p_idx = np.nonzero(np.logical_and(bracketed, ~above_limit))
+    a = log_cycles[k[e_idx, p_idx]]
+    b = log_cycles[k[e_idx, p_idx] + 1]
+    fa = f_grid[e_idx, p_idx, k[e_idx, p_idx]]
+    fb = f_grid[e_idx, p_idx, k[e_idx, p_idx] + 1]
+    x = (a + b)/2
+    done = np.logical_or(fb == 0, (b - a)/2 <= tolerance)
+    x[fb == 0] = b[fb == 0]
+    side = np.zeros(a.shape[0], dtype=int)
+    width = b - a
+    steps_since_halved = np.zeros(a.shape[0], dtype=int)
+    while not np.all(done):
+        active = np.nonzero(~done)[0]
+        # Illinois step, bisection if the bracket has shrunk too slowly
+        x_new = (a[active]*fb[active] - b[active]*fa[active])/(fb[active] - fa[active])
+        bisect = np.logical_or(steps_since_halved[active] >= 3, ~np.isfinite(x_new))
+        x_new[bisect] = (a[active] + b[active])[bisect]/2
+        x_new = np.clip(x_new, a[active], b[active])
+        f_new = residual(np.array([pf_value(e, xi) for e, xi in zip(e_idx[active], x_new)]), pf_levels[p_idx[active]])
+        x[active] = x_new
+
+        slope = (fb[active] - fa[active])/(b[active] - a[active])
+        root = np.logical_or(f_new == 0, np.abs(f_new) <= np.abs(slope)*tolerance)
+        left = f_new*fa[active] > 0
+        # The Illinois modification halves the value at the end point kept twice in a row
+        fb[active[np.logical_and(left, side[active] == -1)]] /= 2
+        fa[active[np.logical_and(~left, side[active] == 1)]] /= 2
+        a[active[left]] = x_new[left]
+        fa[active[left]] = f_new[left]
+        b[active[~left]] = x_new[~left]
+        fb[active[~left]] = f_new[~left]
+        side[active] = np.where(left, -1, 1)
+
+        halved = b[active] - a[active] <= width[active]/2
+        width[active[halved]] = (b - a)[active[halved]]
+        steps_since_halved[active] = np.where(halved, 0, steps_since_halved[active] + 1)
+        bracket_converged = (b[active] - a[active])/2 <= tolerance
+        x[active[bracket_converged]] = (a[active] + b[active])[bracket_converged]/2
+        done[active] = np.logical_or(root, bracket_converged)
+
+    lives[e_idx, p_idx] = x
+    lives = np.exp(lives)
+    lives[above_limit] = float("NaN")
+    return lives
+
+
+def surface_data(volume_data, faces=None, exclude_planes=None, exclude=None):
+    # FEM_data of the surface faces of the Element8 mesh in volume_data, for the data_area of WeakestLinkEvaluator.
+    # faces is the element and local face of each face, by default exposed_faces of the mesh without the faces on
+    # exclude_planes and the faces selected by exclude, for instance the cut and symmetry planes of a tooth model
+    if faces is None:
+        faces = exposed_faces(volume_data.nodal_positions, exclude_planes=exclude_planes, exclude=exclude)
+    elements, local_faces = faces
+    nodes = element8_faces[local_faces]
+    elements = np.asarray(elements)[:, None]
+    return FEM_data(stress=volume_data.stress[elements, nodes],
+                    steel_data=type(volume_data.steel_data)(*[np.asarray(field)[elements, nodes]
+                                                              for field in volume_data.steel_data]),
+                    nodal_positions=volume_data.nodal_positions[elements, nodes])